@@ -0,0 +1,353 @@
+from typing import List, Tuple, NamedTuple, Union
+
+from checkers import Checkers
+
+
+
+
+# the 32 playable squares are numbered row by row, four per row:
+#
+#   row 0:    .  0  .  1  .  2  .  3
+#   row 1:    4  .  5  .  6  .  7  .
+#   row 2:    .  8  .  9  . 10  . 11
+#   ...
+#
+# square = row * 4 + col // 2, so even rows start one column to the right of odd rows,
+# which is why the diagonal shifts below depend on the parity of the row
+
+FULL = 0xFFFFFFFF
+
+EVEN_ROWS = 0x0F0F0F0F
+ODD_ROWS = 0xF0F0F0F0
+
+# first and last square of every row
+LEFT_EDGE = 0x11111111
+RIGHT_EDGE = 0x88888888
+
+# promotion rows
+BLACK_BACK_ROW = 0x0000000F    # row 0
+WHITE_BACK_ROW = 0xF0000000    # row 7
+
+
+
+
+# ----------------
+# DIAGONAL SHIFTS
+# ----------------
+
+# each shift maps every set bit to its diagonal neighbour, bits falling off the board are dropped
+
+def down_left(bb: int) -> int:
+    return (((bb & EVEN_ROWS) << 4) | ((bb & ODD_ROWS & ~LEFT_EDGE) << 3)) & FULL
+
+
+def down_right(bb: int) -> int:
+    return (((bb & EVEN_ROWS & ~RIGHT_EDGE) << 5) | ((bb & ODD_ROWS) << 4)) & FULL
+
+
+def up_left(bb: int) -> int:
+    return ((bb & EVEN_ROWS) >> 4) | ((bb & ODD_ROWS & ~LEFT_EDGE) >> 5)
+
+
+def up_right(bb: int) -> int:
+    return ((bb & EVEN_ROWS & ~RIGHT_EDGE) >> 3) | ((bb & ODD_ROWS) >> 4)
+
+
+# (shift, opposite shift) for every direction
+UP = [(up_left, down_right), (up_right, down_left)]
+DOWN = [(down_left, up_right), (down_right, up_left)]
+ALL = UP + DOWN
+
+
+
+
+# -------------
+# SQUARE TABLES
+# -------------
+
+LOCATIONS = [Checkers.Location(square // 4, 2 * (square % 4) + 1 - (square // 4) % 2) for square in range(32)]
+
+
+def location_to_square(location: Checkers.Location) -> int:
+    return location.row * 4 + location.col // 2
+
+
+def iter_squares(bb: int):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+# NEIGHBOUR[shift][square] is the square reached by applying the shift to a single bit
+NEIGHBOUR = {
+    shift: [shift(1 << square).bit_length() - 1 for square in range(32)]
+    for shift in (down_left, down_right, up_left, up_right)
+}
+
+
+
+
+class Bitboard(NamedTuple):
+    black: int
+    white: int
+    kings: int
+
+
+    # ----------
+    # CONVERSION
+    # ----------
+
+    @staticmethod
+    def from_board(board: List[List[int]]) -> "Bitboard":
+        black = white = kings = 0
+        for square, location in enumerate(LOCATIONS):
+            value = board[location.row][location.col]
+            bit = 1 << square
+            if value > 0:
+                black |= bit
+            elif value < 0:
+                white |= bit
+            if abs(value) == 3:
+                kings |= bit
+
+        return Bitboard(black, white, kings)
+
+
+    @staticmethod
+    def from_checkers(checkers: Checkers) -> "Bitboard":
+        return Bitboard.from_board(checkers.board)
+
+
+    def to_board(self) -> List[List[int]]:
+        board = [[Checkers.empty] * Checkers.size for _ in range(Checkers.size)]
+        for square, location in enumerate(LOCATIONS):
+            bit = 1 << square
+            if self.black & bit:
+                value = Checkers.black
+            elif self.white & bit:
+                value = Checkers.white
+            else:
+                continue
+
+            board[location.row][location.col] = value * 3 if self.kings & bit else value
+
+        return board
+
+
+    def to_checkers(self) -> Checkers:
+        return Checkers(self.to_board())
+
+
+    # -------
+    # GETTERS
+    # -------
+
+    def empty(self) -> int:
+        return ~(self.black | self.white) & FULL
+
+
+    def pieces(self, player: Checkers.Player) -> int:
+        if player == Checkers.black:
+            return self.black
+        elif player == Checkers.white:
+            return self.white
+        else:
+            raise Exception("Invalid player argument.")
+
+
+    def count(self, player: Checkers.Player) -> int:
+        return bin(self.pieces(player)).count("1")
+
+
+    def kings_count(self, player: Checkers.Player) -> int:
+        return bin(self.pieces(player) & self.kings).count("1")
+
+
+    # (shift, opposite shift, pieces allowed to use it) for the given player
+    def directions(self, player: Checkers.Player) -> List[Tuple]:
+        pieces = self.pieces(player)
+        kings = pieces & self.kings
+        forward, backward = (UP, DOWN) if player == Checkers.black else (DOWN, UP)
+
+        return [(shift, opposite, pieces) for shift, opposite in forward] + \
+               [(shift, opposite, kings) for shift, opposite in backward]
+
+
+    # ---------------
+    # MOVE GENERATION
+    # ---------------
+
+    # every quiet move of the player as (origin, destination) squares
+    def get_moves(self, player: Checkers.Player) -> List[Tuple[int, int]]:
+        empty = self.empty()
+        moves = []
+
+        for shift, opposite, pieces in self.directions(player):
+            if not pieces:
+                continue
+
+            neighbour = NEIGHBOUR[shift]
+            for square in iter_squares(opposite(empty) & pieces):
+                moves.append((square, neighbour[square]))
+
+        return moves
+
+
+    # every single jump of the player as (origin, jumped, destination) squares
+    def get_jumps(self, player: Checkers.Player) -> List[Tuple[int, int, int]]:
+        empty = self.empty()
+        enemies = self.pieces(-player)
+        jumps = []
+
+        for shift, opposite, pieces in self.directions(player):
+            if not pieces:
+                continue
+
+            neighbour = NEIGHBOUR[shift]
+            for square in iter_squares(opposite(opposite(empty) & enemies) & pieces):
+                jumped = neighbour[square]
+                jumps.append((square, jumped, neighbour[jumped]))
+
+        return jumps
+
+
+    def can_jump(self, player: Checkers.Player) -> bool:
+        empty = self.empty()
+        enemies = self.pieces(-player)
+
+        for shift, opposite, pieces in self.directions(player):
+            if opposite(opposite(empty) & enemies) & pieces:
+                return True
+
+        return False
+
+
+    # every complete jump sequence of the player as the list of visited squares,
+    # a sequence stops when no further jump is available or when a man gets promoted
+    def get_jump_sequences(self, player: Checkers.Player) -> List[List[int]]:
+        seqs = []
+        # get_jumps lists one entry per direction, only expand each piece once
+        for origin in sorted({origin for origin, _, _ in self.get_jumps(player)}):
+            seqs.extend(self.get_jump_sequences_for_square(origin))
+
+        return seqs
+
+
+    def get_jump_sequences_for_square(self, origin: int) -> List[List[int]]:
+        bit = 1 << origin
+        player = Checkers.black if self.black & bit else Checkers.white
+        enemies = self.pieces(-player)
+        king = bool(self.kings & bit)
+        back_row = BLACK_BACK_ROW if player == Checkers.black else WHITE_BACK_ROW
+        shifts = ALL if king else (UP if player == Checkers.black else DOWN)
+
+        seqs = []
+        # the moving piece leaves its origin, so a king may pass over it again,
+        # captured pieces are removed as soon as they are jumped
+        stack = [(origin, enemies, self.empty() | bit, [origin])]
+
+        while stack:
+            square, enemies, empty, path = stack.pop()
+            extended = False
+
+            for shift, _ in shifts:
+                neighbour = NEIGHBOUR[shift]
+                jumped = neighbour[square]
+                if jumped < 0 or not enemies & (1 << jumped):
+                    continue
+                landing = neighbour[jumped]
+                if landing < 0 or not empty & (1 << landing):
+                    continue
+
+                extended = True
+                landing_bit = 1 << landing
+                if not king and landing_bit & back_row:
+                    # promotion ends the sequence
+                    seqs.append(path + [landing])
+                else:
+                    jumped_bit = 1 << jumped
+                    stack.append((landing, enemies & ~jumped_bit, empty | jumped_bit, path + [landing]))
+
+            if not extended and len(path) > 1:
+                seqs.append(path)
+
+        return seqs
+
+
+    # captures are mandatory: jump sequences if any exist, quiet moves otherwise,
+    # every action is the list of squares visited by the moving piece
+    def get_actions(self, player: Checkers.Player) -> List[List[int]]:
+        if self.can_jump(player):
+            return self.get_jump_sequences(player)
+
+        return [[origin, destination] for origin, destination in self.get_moves(player)]
+
+
+    # --------------
+    # MOVE APPLYING
+    # --------------
+
+    # returns the new position, the current one is left untouched
+    def apply(self, path: List[int]) -> "Bitboard":
+        origin = path[0]
+        destination = path[-1]
+        origin_bit = 1 << origin
+        destination_bit = 1 << destination
+
+        black, white, kings = self
+        captured = 0
+        for i in range(1, len(path)):
+            if abs(path[i] - path[i - 1]) > 5:
+                captured |= 1 << jumped_square(path[i - 1], path[i])
+
+        if black & origin_bit:
+            black = (black & ~origin_bit) | destination_bit
+            white &= ~captured
+            promoted = destination_bit & BLACK_BACK_ROW
+        else:
+            white = (white & ~origin_bit) | destination_bit
+            black &= ~captured
+            promoted = destination_bit & WHITE_BACK_ROW
+
+        if kings & origin_bit:
+            kings = (kings & ~origin_bit) | destination_bit
+        elif promoted:
+            kings |= destination_bit
+        kings &= ~captured
+
+        return Bitboard(black, white, kings)
+
+
+    # -----------------
+    # CHECKERS INTEROP
+    # -----------------
+
+    # converts a path of squares into the (location, action) format used by Checkers.apply
+    @staticmethod
+    def to_action(path: List[int]) -> Tuple[Checkers.Location, Union[Checkers.Move, List[Checkers.Jump]]]:
+        locations = [LOCATIONS[square] for square in path]
+        origin = locations[0]
+
+        if (locations[1] - origin).is_move():
+            return origin, Checkers.Move(*(locations[1] - origin))
+
+        return origin, [Checkers.Jump(*(b - a)) for a, b in zip(locations, locations[1:])]
+
+
+    @staticmethod
+    def from_action(location: Checkers.Location, action: Union[Checkers.Move, List[Checkers.Jump]]) -> List[int]:
+        path = [location_to_square(location)]
+        for step in (action if type(action) == list else [action]):
+            location = Checkers.Location(location.row + step.row, location.col + step.col)
+            path.append(location_to_square(location))
+
+        return path
+
+
+
+
+def jumped_square(origin: int, destination: int) -> int:
+    a = LOCATIONS[origin]
+    b = LOCATIONS[destination]
+    return location_to_square(Checkers.Location((a.row + b.row) // 2, (a.col + b.col) // 2))
@@ -0,0 +1,173 @@
+import argparse
+import copy
+import logging
+import struct
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from math import inf
+from typing import List, NamedTuple, Optional, Tuple
+
+from checkers import Checkers
+from bitboard import Bitboard
+from records import RecordFile
+
+
+
+
+logger = logging.getLogger(__name__)
+
+
+
+
+# opening book: the best move of the positions of the first plies, found offline by deep searches,
+# looked up by the zobrist hash of the board (which includes the side to move)
+
+
+
+
+class OpeningBook:
+
+    # ------------------
+    # NAMESPACED CLASSES
+    # ------------------
+
+    class Entry(NamedTuple):
+        move: Tuple
+        value: float
+        depth: int
+
+
+
+    magic = b"CKBOOK01"
+
+    # key, value, depth, length of the path, squares of the path
+    record = struct.Struct("<QiBB10s")
+
+    # stored for won and lost positions
+    win_value = 1 << 30
+
+
+
+    # ----------------
+    # PUBLIC FUNCTIONS
+    # ----------------
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.records = RecordFile(path, OpeningBook.record, OpeningBook.magic)
+
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+    def __reduce__(self) -> Tuple:
+        return OpeningBook, (self.path,)
+
+
+    def close(self) -> None:
+        self.records.close()
+
+
+    # None when the position is not in the book, the move is checked to be legal in case of a hash collision
+    def probe(self, board: Checkers, player: Checkers.Player) -> Optional[Entry]:
+        found = self.records.find(board.hash)
+        if found is None:
+            return None
+
+        _, value, depth, length, path = found
+        move = Bitboard.to_action(list(path[:length]))
+        if not board.is_legal(player, *move):
+            return None
+
+        if abs(value) == OpeningBook.win_value:
+            value = inf if value > 0 else -inf
+
+        return OpeningBook.Entry(move, value, depth)
+
+
+    @staticmethod
+    def pack(key: int, move: Tuple, value: float, depth: int) -> Tuple:
+        path = Bitboard.from_action(*move)
+        if len(path) > 10:
+            raise Exception("Path too long for the book.")
+
+        if abs(value) == inf:
+            value = OpeningBook.win_value if value > 0 else -OpeningBook.win_value
+
+        return key, int(value), depth, len(path), bytes(path)
+
+
+
+
+# --------
+# BUILDING
+# --------
+
+# runs in a worker process, the best move of one position
+def search_position(board: Checkers, depth: int, time_limit: Optional[float]) -> Tuple[int, Tuple, float, int]:
+    from engine import Engine
+
+    engine = Engine(board)
+    result = engine.search(board.player, engine.alpha_beta, depth, time_limit)
+    engine.close()
+
+    return board.hash, result.move, result.value, result.depth
+
+
+# breadth first over every line of the first plies, a position reached by several move orders is searched
+# once, the positions closest to the start are kept if max_positions is reached
+def build(path: str, plies: int, depth: int, time_limit: float = None, max_positions: int = 5000, workers: int = 4) -> int:
+    entries = {}
+    layer = [Checkers()]
+    seen = {layer[0].hash}
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        for ply in range(plies):
+            layer = [board for board in layer if not board.won()][:max_positions - len(entries)]
+            if not layer:
+                break
+
+            start = time.perf_counter()
+            for key, move, value, reached in executor.map(search_position, layer, [depth] * len(layer),
+                                                            [time_limit] * len(layer)):
+                if move is not None:
+                    entries[key] = OpeningBook.pack(key, move, value, reached)
+            logger.info("ply %d: %d positions in %.1fs", ply + 1, len(layer), time.perf_counter() - start)
+
+            following = []
+            for board in layer:
+                for option in board.iter_actions(board.player):
+                    child = copy.deepcopy(board)
+                    child.apply(*option)
+                    if child.hash not in seen:
+                        seen.add(child.hash)
+                        following.append(child)
+            layer = following
+
+    return RecordFile.write(path, OpeningBook.record, OpeningBook.magic, entries.values())
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description = "Builds the opening book.")
+    parser.add_argument("output")
+    parser.add_argument("--plies", type = int, default = 8, help = "positions up to this many plies from the start")
+    parser.add_argument("--depth", type = int, default = 10)
+    parser.add_argument("--time", type = float, help = "seconds per position")
+    parser.add_argument("--positions", type = int, default = 5000)
+    parser.add_argument("--workers", type = int, default = 4)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level = logging.INFO, format = "%(message)s")
+
+    count = build(args.output, args.plies, args.depth, args.time, args.positions, args.workers)
+    logger.info("%d positions written to %s", count, args.output)
+
+    return 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
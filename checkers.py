@@ -1,9 +1,20 @@
 import copy
-from typing import List, Tuple, NamedTuple, Union, Set
+import random
+from typing import Dict, Iterator, List, Tuple, NamedTuple, Union, Set
 
 
 
 
+# one random 64 bit key per (pawn type, row, col), seeded so that every process agrees on the hashes
+def generate_zobrist_keys(seed: int) -> Tuple[Dict[int, List[List[int]]], int]:
+    rng = random.Random(seed)
+    keys = {pawn_type: [[rng.getrandbits(64) for _ in range(8)] for _ in range(8)] for pawn_type in (1, -1, 3, -3)}
+    # xored in when white is to move
+    player_key = rng.getrandbits(64)
+
+    return keys, player_key
+
+
 class Checkers:
 
     # ------------------
@@ -54,6 +65,17 @@ class Checkers:
         pawn_type: "Pawn_type"
 
 
+    # everything make_move changed, enough for unmake_move to restore the previous position
+    class Undo(NamedTuple):
+        location: "Location"
+        destination: "Location"
+        pawn_type: "Pawn_type"
+        captured: List[Tuple["Location", "Pawn_type"]]
+        counters: Tuple[int, int, int, int, int, int]
+        player: "Player"
+        hash: int
+
+
     Player = int
 
 
@@ -82,13 +104,13 @@ class Checkers:
     ]
 
     black_moves = [Move(-1, -1), Move(-1, 1)]
-    black_jumps = [Move(-2, -2), Move(-2, 2)]
+    black_jumps = [Jump(-2, -2), Jump(-2, 2)]
 
     white_moves = [Move(1, -1), Move(1, 1)]
-    white_jumps = [Move(2, -2), Move(2, 2)]
+    white_jumps = [Jump(2, -2), Jump(2, 2)]
 
     king_moves = [Move(-1, -1), Move(-1, 1), Move(1, -1), Move(1, 1)]
-    king_jumps = [Move(-2, -2), Move(-2, 2), Move(2, -2), Move(2, 2)]
+    king_jumps = [Jump(-2, -2), Jump(-2, 2), Jump(2, -2), Jump(2, 2)]
 
     black = 1
     white = -1
@@ -97,20 +119,66 @@ class Checkers:
     empty = 0
     size = 8
 
+    zobrist_keys, zobrist_player = generate_zobrist_keys(0x636865636b657273)
+
 
 
     # ----------------
     # PUBLIC FUNCTIONS
     # ----------------
 
-    def __init__(self, board: List[List[int]] = default_board) -> None:
+    def __init__(self, board: List[List[int]] = default_board, player: Player = black) -> None:
         self.board = copy.deepcopy(board)
+        self.player = player
         self.white_score = 0
         self.black_score = 0
-        self.white_count = 12
-        self.black_count = 12
-        self.white_kings_count = 0
-        self.black_kings_count = 0
+        self.white_count = sum(cell < 0 for row in board for cell in row)
+        self.black_count = sum(cell > 0 for row in board for cell in row)
+        self.white_kings_count = sum(cell == Checkers.white_king for row in board for cell in row)
+        self.black_kings_count = sum(cell == Checkers.black_king for row in board for cell in row)
+        self._hash = self.compute_hash()
+
+
+    @staticmethod
+    def from_bitboard(bitboard: "Bitboard") -> "Checkers":
+        return bitboard.to_checkers()
+
+
+    def to_bitboard(self) -> "Bitboard":
+        from bitboard import Bitboard
+        return Bitboard.from_checkers(self)
+
+
+    @staticmethod
+    def from_position(position: "Position") -> "Checkers":
+        return position.to_checkers()
+
+
+    def to_position(self) -> "Position":
+        from position import Position
+        return Position.from_checkers(self)
+
+
+    # zobrist hash of the pieces and the side to move, kept up to date by every board change
+    @property
+    def hash(self) -> int:
+        return self._hash
+
+
+    # from scratch, only needed once per board
+    def compute_hash(self) -> int:
+        key = Checkers.zobrist_player if self.player == Checkers.white else 0
+        for i, row in enumerate(self.board):
+            for j, location_type in enumerate(row):
+                if location_type != Checkers.empty:
+                    key ^= Checkers.zobrist_keys[location_type][i][j]
+
+        return key
+
+
+    def switch_player(self) -> None:
+        self.player = -self.player
+        self._hash ^= Checkers.zobrist_player
 
 
     def __repr__(self) -> str:
@@ -196,9 +264,9 @@ class Checkers:
 
     def won(self) -> int:
         if self.black_count == 0:
-            return Checkers.black
-        elif self.white_count == 0:
             return Checkers.white
+        elif self.white_count == 0:
+            return Checkers.black
         else:
             return None
 
@@ -231,13 +299,18 @@ class Checkers:
             return False
 
         # increase the value of the pawn
+        pawn_type = self.board[location.row][location.col]
         self.board[location.row][location.col] *= 3
+        keys = Checkers.zobrist_keys
+        self._hash ^= keys[pawn_type][location.row][location.col] ^ keys[pawn_type * 3][location.row][location.col]
 
-        # increase the player's score
+        # increase the player's score and kings count
         if self.is_black(location):
             self.black_score += 3
+            self.black_kings_count += 1
         else:
             self.white_score += 3
+            self.white_kings_count += 1
 
         return True
 
@@ -245,28 +318,19 @@ class Checkers:
     # move logic
 
     def valid_move(self, location: Location, move: Move) -> bool:
-        destination = location + move
-        if not (0 <= destination.row < Checkers.size and 0 <= destination.col < Checkers.size):
-            # list index of destination is out of range
-            return False
-
-        destination_type = self.board[destination.row][destination.col]
         location_type = self.board[location.row][location.col]
 
         if location_type == Checkers.empty:
             # attempts to move nothing
             return False
 
-        if destination_type != Checkers.empty:
-            # attempted destination is not empty
-            return False
+        for possible_move, destination in Checkers.move_table[location_type][location.row][location.col]:
+            if possible_move == move:
+                # the pawn can move in that direction, the destination must be empty
+                return self.board[destination.row][destination.col] == Checkers.empty
 
-        # location is a pawn and the destination is empty,
-        # assert if the pawn can move in that direction
-        if move in self.get_possible_moves(location):
-            return True
-        else:
-            return False
+        # the destination is out of range or the pawn can not move in that direction
+        return False
 
 
     def move(self, location: Location, move: Move) -> Move_outcome:
@@ -276,90 +340,87 @@ class Checkers:
         destination = location + move
 
         # move is valid, apply it
-        self.board[destination.row][destination.col] = self.board[location.row][location.col]
+        location_type = self.board[location.row][location.col]
+        self.board[destination.row][destination.col] = location_type
         self.board[location.row][location.col] = Checkers.empty
+        keys = Checkers.zobrist_keys[location_type]
+        self._hash ^= keys[location.row][location.col] ^ keys[destination.row][destination.col]
 
         # promote if needed
         promoted = self.promote(destination)
 
+        self.switch_player()
+
         return (True, promoted)
 
 
     # jump logic
 
     def valid_jump(self, location: Location, jump: Move) -> bool:
-        destination = location + jump
-        if not (0 <= destination.row < Checkers.size and 0 <= destination.col < Checkers.size):
-            # list index of destination is out of range
-            return False
-
-        destination_type = self.board[destination.row][destination.col]
         location_type = self.board[location.row][location.col]
-        jumped = Checkers.Location(location.row + int(jump.row/2), location.col + int(jump.col/2))
-        jumped_type = self.board[jumped.row][jumped.col]
 
         if location_type == Checkers.empty:
             # attempts to move nothing
             return False
 
-        if destination_type != Checkers.empty:
-            # attempted destination is not empty
-            return False
+        for possible_jump, jumped, destination in Checkers.jump_table[location_type][location.row][location.col]:
+            if possible_jump == jump:
+                # the pawn can jump in that direction, the destination must be empty
+                # and the jumped piece must be an enemy
+                return self.board[destination.row][destination.col] == Checkers.empty and \
+                       self.board[jumped.row][jumped.col] * location_type < 0
 
-        if jumped_type == Checkers.empty:
-            # attempts to jump over nothing
-            return False
+        # the destination is out of range or the pawn can not jump in that direction
+        return False
 
-        if not self.are_enemies(location, jumped):
-            # attempts to jump over ally
-            return False
 
-        # location is a pawn and the destination is empty,
-        # jumped piece is also an enemy,
-        # assert if the pawn can jump in that direction
-        if jump in self.get_possible_jumps(location):
-            return True
-        else:
-            return False
-
-
-    def jump(self, location: Location, jump: Move) -> Move_outcome:
+    # end_turn is false for all but the last jump of a sequence
+    def jump(self, location: Location, jump: Move, end_turn: bool = True) -> Move_outcome:
         if not self.valid_jump(location, jump):
             return (False, False)
 
         destination = location + jump
         jumped = Checkers.Location(location.row + int(jump.row/2), location.col + int(jump.col/2))
         jumped_type = self.board[jumped.row][jumped.col]
+        location_type = self.board[location.row][location.col]
 
         # jump is valid, apply it
         self.board[jumped.row][jumped.col] = Checkers.empty    # eliminate piece
-        self.board[destination.row][destination.col] = self.board[location.row][location.col]    # move the piece
+        self.board[destination.row][destination.col] = location_type    # move the piece
         self.board[location.row][location.col] = Checkers.empty    # set old spot to empty
+        keys = Checkers.zobrist_keys
+        self._hash ^= keys[jumped_type][jumped.row][jumped.col] \
+            ^ keys[location_type][location.row][location.col] ^ keys[location_type][destination.row][destination.col]
 
         # increase player score and decrease enemy counts
         if self.is_black(destination):
             self.black_score += jumped_type
             self.white_count -= 1
-            if self.is_king(jumped):
+            if abs(jumped_type) == 3:
                 self.white_kings_count -= 1
         else:
             self.white_score += jumped_type
             self.black_count -= 1
-            if self.is_king(jumped):
+            if abs(jumped_type) == 3:
                 self.black_kings_count -= 1
 
         # promote if needed
         promoted = self.promote(destination)
 
+        if end_turn:
+            self.switch_player()
+
         return (True, promoted)
 
 
     def apply_jump_sequence(self, location: Location, seq: List[Jump]) -> Move_outcome:
+        promoted = False
         for jump in seq:
-            self.jump(location, jump)
+            _, jump_promoted = self.jump(location, jump, end_turn = False)
+            promoted = promoted or jump_promoted
             location += jump
 
-        promoted = self.promote(location)
+        self.switch_player()
 
         return (True, promoted)
 
@@ -389,19 +450,111 @@ class Checkers:
             raise Exception("Invalid keyword arguments.")
 
 
+    # lazy, flat (location, action) items in stages: the hash move if it is legal, then the jump sequences,
+    # then, only if nothing can be captured, the moves, so a search that cuts off early never pays for the rest,
+    # the board may be changed between items as long as it is restored before the next one is requested
+    def iter_actions(self, player: Player, hash_move: Tuple[Location, Union[Move, List[Jump]]] = None) -> Iterator[Tuple[Location, Union[Move, List[Jump]]]]:
+        if hash_move is not None and self.is_legal(player, *hash_move):
+            yield hash_move
+        else:
+            hash_move = None
+
+        can_jump = False
+        for option in self.iter_jump_sequences_for_player(player):
+            can_jump = True
+            if option != hash_move:
+                yield option
+
+        if can_jump:
+            return
+
+        for option in self.iter_moves_for_player(player):
+            if option != hash_move:
+                yield option
+
+
+    def is_legal(self, player: Player, location: Location, action: Union[Move, List[Jump]]) -> bool:
+        location_type = self.board[location.row][location.col]
+        if location_type * player <= 0:
+            # not a pawn of the player
+            return False
+
+        if type(action) == list:
+            return action in self.iter_jump_sequences_for_pawn(location)
+
+        return self.valid_move(location, action) and not self.can_jump(player)
+
+
+    def can_jump(self, player: Player) -> bool:
+        board = self.board
+        for location in Checkers.playable:
+            if board[location.row][location.col] * player > 0 and self.get_jumps_for_pawn(location):
+                return True
+
+        return False
+
+
     def apply(self, location: Location, action: Union[Move, Jump]) -> Move_outcome:
         if type(action) == Checkers.Move:
             return self.move(location, action)
         elif type(action) == Checkers.Jump:
             return self.jump(location, action)
         elif type(action) == list:
-            for jump in action:
-                self.jump(location, jump)
-                location += jump
+            return self.apply_jump_sequence(location, action)
         else:
             raise Exception("Invalid action type.")
 
 
+    @staticmethod
+    def get_destination(location: Location, action: Union[Move, Jump, List[Jump]]) -> Location:
+        for step in (action if type(action) == list else [action]):
+            location = Checkers.Location(location.row + step.row, location.col + step.col)
+
+        return location
+
+
+    @staticmethod
+    def is_capture(action: Union[Move, Jump, List[Jump]]) -> bool:
+        return type(action) == list or type(action) == Checkers.Jump
+
+
+    # undoable version of apply, the returned record must be handed back to unmake_move
+    # in reverse order of application
+    def make_move(self, location: Location, action: Union[Move, Jump, List[Jump]]) -> Undo:
+        pawn_type = self.board[location.row][location.col]
+        counters = (self.white_score, self.black_score, self.white_count, self.black_count,
+                    self.white_kings_count, self.black_kings_count)
+        player = self.player
+        key = self._hash
+
+        # collect the pieces that are about to be captured
+        captured = []
+        destination = location
+        for step in (action if type(action) == list else [action]):
+            if step.is_jump():
+                jumped = Checkers.Location(destination.row + step.row // 2, destination.col + step.col // 2)
+                captured.append((jumped, self.board[jumped.row][jumped.col]))
+            destination = Checkers.Location(destination.row + step.row, destination.col + step.col)
+
+        self.apply(location, action)
+
+        return Checkers.Undo(location, destination, pawn_type, captured, counters, player, key)
+
+
+    def unmake_move(self, undo: Undo) -> None:
+        # clear the destination first, a king may end its jump sequence where it started
+        self.board[undo.destination.row][undo.destination.col] = Checkers.empty
+        self.board[undo.location.row][undo.location.col] = undo.pawn_type
+
+        for jumped, pawn_type in undo.captured:
+            self.board[jumped.row][jumped.col] = pawn_type
+
+        (self.white_score, self.black_score, self.white_count, self.black_count,
+         self.white_kings_count, self.black_kings_count) = undo.counters
+        self.player = undo.player
+        self._hash = undo.hash
+
+
 
 
 
@@ -412,25 +565,24 @@ class Checkers:
     # PRIVATE GETTERS
 
     def get_moves_for_pawn(self, location: Location) -> List[Move]:
-        valid_moves = []
-        possible_moves = self.get_possible_moves(location)
-
-        for move in possible_moves:
-            if self.valid_move(location, move):
-                valid_moves.append(move)
+        board = self.board
+        location_type = board[location.row][location.col]
+        if location_type == Checkers.empty:
+            raise Exception("Invalid location type.")
 
-        return valid_moves
+        return [move for move, destination in Checkers.move_table[location_type][location.row][location.col]
+                if board[destination.row][destination.col] == Checkers.empty]
 
 
     def get_jumps_for_pawn(self, location: Location) -> List[Jump]:
-        valid_jumps = []
-        possible_jumps = self.get_possible_jumps(location)
-
-        for jump in possible_jumps:
-            if self.valid_jump(location, jump):
-                valid_jumps.append(jump)
+        board = self.board
+        location_type = board[location.row][location.col]
+        if location_type == Checkers.empty:
+            raise Exception("Invalid location type.")
 
-        return valid_jumps
+        return [jump for jump, jumped, destination in Checkers.jump_table[location_type][location.row][location.col]
+                if board[destination.row][destination.col] == Checkers.empty
+                and board[jumped.row][jumped.col] * location_type < 0]
 
 
     def get_moves_for_player(self, player: Player) -> List[Tuple[Location, List[Move]]]:
@@ -443,13 +595,11 @@ class Checkers:
 
         player_moves = []
 
-        for i, row in enumerate(self.board):
-            for j, location_type in enumerate(row):
-                location = Checkers.Location(i, j)
-                if type_assessment(location):
-                    moves = self.get_moves_for_pawn(location)
-                    if moves:
-                        player_moves.append((location, moves))
+        for location in Checkers.playable:
+            if type_assessment(location):
+                moves = self.get_moves_for_pawn(location)
+                if moves:
+                    player_moves.append((location, moves))
 
         return player_moves
 
@@ -464,47 +614,141 @@ class Checkers:
 
         player_jumps = []
 
-        for i, row in enumerate(self.board):
-            for j, location_type in enumerate(row):
-                location = Checkers.Location(i, j)
-                if type_assessment(location):
-                    jumps = self.get_jumps_for_pawn(location)
-                    if jumps:
-                        player_jumps.append((location, jumps))
+        for location in Checkers.playable:
+            if type_assessment(location):
+                jumps = self.get_jumps_for_pawn(location)
+                if jumps:
+                    player_jumps.append((location, jumps))
 
         return player_jumps
 
 
 
 
-    # instead of generating new boards everytime, we will keep a list of pawns that have been removed from the game,
-    # we can then check if the play a role in the current iteration's attempts and act accordingly
     def get_jump_sequences_for_pawn(self, location: Location) -> List[List[Jump]]:
-        seqs = []
+        return list(self.iter_jump_sequences_for_pawn(location))
+
+
+    # depth first walk over the capture chains with an explicit stack, captured pieces are taken off
+    # this board while they are on the current path and put back on backtrack,
+    # the board is fully restored around every yield, so the caller may apply and take back moves
+    # between two sequences
+    def iter_jump_sequences_for_pawn(self, location: Location) -> Iterator[List[Jump]]:
+        board = self.board
+        pawn_type = board[location.row][location.col]
+        if pawn_type == Checkers.empty:
+            raise Exception("Invalid location type.")
+
+        if pawn_type == Checkers.black:
+            promotion_row = 0
+        elif pawn_type == Checkers.white:
+            promotion_row = Checkers.size - 1
+        else:
+            promotion_row = None
+
+        if not self.get_jumps_for_pawn(location):
+            # the common case, nothing to walk
+            return
+
+        jump_table = Checkers.jump_table[pawn_type]
+        path = []
+        captured = []
+        lifted = False
+
+        def lift() -> None:
+            nonlocal lifted
+            lifted = True
+            # the moving pawn leaves its cell, a king may jump back over it
+            board[location.row][location.col] = Checkers.empty
+            for jumped, _ in captured:
+                board[jumped.row][jumped.col] = Checkers.empty
+
+        def restore() -> None:
+            nonlocal lifted
+            lifted = False
+            for jumped, jumped_type in captured:
+                board[jumped.row][jumped.col] = jumped_type
+            board[location.row][location.col] = pawn_type
+
+        # frames are [cell, next jump table index, whether any jump was found from the cell]
+        stack = [[location, 0, False]]
+        lift()
+
+        try:
+            while stack:
+                frame = stack[-1]
+                cell, index, _ = frame
+                entries = jump_table[cell.row][cell.col]
+
+                while index < len(entries):
+                    jump, jumped, destination = entries[index]
+                    index += 1
+
+                    jumped_type = board[jumped.row][jumped.col]
+                    if board[destination.row][destination.col] != Checkers.empty or jumped_type * pawn_type >= 0:
+                        continue
+
+                    frame[1] = index
+                    frame[2] = True
+                    path.append(jump)
+                    captured.append((jumped, jumped_type))
+                    board[jumped.row][jumped.col] = Checkers.empty
+
+                    if destination.row == promotion_row:
+                        # promotion ends the sequence
+                        restore()
+                        yield list(path)
+                        lift()
+
+                        board[jumped.row][jumped.col] = jumped_type
+                        captured.pop()
+                        path.pop()
+                        continue
+
+                    stack.append([destination, 0, False])
+                    break
+
+                else:
+                    # every jump from this cell has been explored
+                    stack.pop()
+
+                    if not frame[2] and path:
+                        # nothing left to capture, the sequence is complete
+                        restore()
+                        yield list(path)
+                        lift()
 
-        for jump in self.get_jumps_for_pawn(location):
-            new_board = copy.deepcopy(self)
-            _, promoted = new_board.jump(location, jump)
+                    if path:
+                        # take back the jump that led here
+                        jumped, jumped_type = captured.pop()
+                        board[jumped.row][jumped.col] = jumped_type
+                        path.pop()
 
-            if promoted:
-                return [[jump]]
+        finally:
+            # the board is already restored at every yield, this only matters if something raised mid walk
+            if lifted:
+                restore()
 
-            ret = new_board.get_jump_sequences_for_pawn(location + jump)
-            if ret:
-                for seq in ret:
-                    seq.insert(0, jump)
-                
-                seqs.extend(ret)
-            else:
-                seqs.append([jump])
 
 
-        return seqs
 
 
 
+    def iter_moves_for_player(self, player: Player) -> Iterator[Tuple[Location, Move]]:
+        board = self.board
+        for location in Checkers.playable:
+            if board[location.row][location.col] * player > 0:
+                for move in self.get_moves_for_pawn(location):
+                    yield location, move
 
 
+    def iter_jump_sequences_for_player(self, player: Player) -> Iterator[Tuple[Location, List[Jump]]]:
+        board = self.board
+        for location in Checkers.playable:
+            if board[location.row][location.col] * player > 0:
+                for seq in self.iter_jump_sequences_for_pawn(location):
+                    yield location, seq
+
 
     # #[ (location, [ jump_sequence ] ) ]
     def get_jump_sequences_for_player(self, player: Player) -> List[Tuple[Location, List[List[Jump]]]]:
@@ -517,13 +761,11 @@ class Checkers:
 
         player_seqs = []
 
-        for i, row in enumerate(self.board):
-            for j, location_type in enumerate(row):
-                location = Checkers.Location(i, j)
-                if type_assessment(location):
-                    jumps = self.get_jump_sequences_for_pawn(location)
-                    if jumps:
-                        player_seqs.append((location, jumps))
+        for location in Checkers.playable:
+            if type_assessment(location):
+                jumps = self.get_jump_sequences_for_pawn(location)
+                if jumps:
+                    player_seqs.append((location, jumps))
 
         return player_seqs
 
@@ -553,3 +795,43 @@ class Checkers:
             return Checkers.king_jumps
         else:
             raise Exception("Invalid location type.")
+
+
+
+# shared Location instances for every cell, so that scanning the board does not allocate
+Checkers.locations = [[Checkers.Location(i, j) for j in range(Checkers.size)] for i in range(Checkers.size)]
+
+
+# the dark cells, the only ones pieces ever stand on
+Checkers.playable = [location for row in Checkers.locations for location in row if (location.row + location.col) % 2 == 1]
+
+
+# for every pawn type and cell: the (move, destination) and (jump, jumped, destination) entries that stay
+# on the board, built once so that move generation does no bounds checks or arithmetic
+def build_move_table(moves: List[Checkers.Move]) -> List[List[List[Tuple[Checkers.Move, Checkers.Location]]]]:
+    size = Checkers.size
+    return [[[(move, Checkers.locations[i + move.row][j + move.col]) for move in moves
+              if 0 <= i + move.row < size and 0 <= j + move.col < size]
+             for j in range(size)] for i in range(size)]
+
+
+def build_jump_table(jumps: List[Checkers.Jump]) -> List[List[List[Tuple[Checkers.Jump, Checkers.Location, Checkers.Location]]]]:
+    size = Checkers.size
+    return [[[(jump, Checkers.locations[i + jump.row // 2][j + jump.col // 2], Checkers.locations[i + jump.row][j + jump.col])
+              for jump in jumps if 0 <= i + jump.row < size and 0 <= j + jump.col < size]
+             for j in range(size)] for i in range(size)]
+
+
+Checkers.move_table = {
+    Checkers.black: build_move_table(Checkers.black_moves),
+    Checkers.white: build_move_table(Checkers.white_moves),
+    Checkers.black_king: build_move_table(Checkers.king_moves),
+    Checkers.white_king: build_move_table(Checkers.king_moves),
+}
+
+Checkers.jump_table = {
+    Checkers.black: build_jump_table(Checkers.black_jumps),
+    Checkers.white: build_jump_table(Checkers.white_jumps),
+    Checkers.black_king: build_jump_table(Checkers.king_jumps),
+    Checkers.white_king: build_jump_table(Checkers.king_jumps),
+}
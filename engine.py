@@ -0,0 +1,708 @@
+from __future__ import annotations
+
+import copy
+import logging
+import time
+
+from math import inf
+from typing import Iterator, List, Tuple, NamedTuple, Callable, Optional, Union
+
+from checkers import Checkers
+from transposition import TranspositionTable
+from ordering import MoveOrdering
+import evaluation
+
+
+
+
+# nothing is formatted unless the level is enabled, attach a handler to see the search
+logger = logging.getLogger(__name__)
+
+
+
+
+# raised inside the search once its time or node budget is spent
+class SearchAborted(Exception):
+    pass
+
+
+
+
+# the search half of the game, kept apart from the ui so that it can run in worker processes
+
+class Engine:
+
+    # ------------------
+    # NAMESPACED CLASSES
+    # ------------------
+
+    class Search_result(NamedTuple):
+        move: Tuple["Checkers.Location", Union["Checkers.Move", List["Checkers.Jump"]]]
+        value: float
+        depth: int
+        nodes: int
+        time: float
+        quiescence_nodes: int = 0
+        # the expected continuation, best move first
+        pv: Tuple = ()
+        # only when the engine collects statistics
+        stats: Optional["SearchStats"] = None
+
+
+
+    def __init__(self, board: Checkers = None,
+                 transposition_size: int = 1 << 16,
+                 transposition_replacement: str = TranspositionTable.depth_preferred,
+                 workers: int = 1,
+                 batch_evaluation: bool = False,
+                 quiescence_limit: int = 20000,
+                 book: str = None,
+                 tablebase: str = None,
+                 collect_stats: bool = False,
+                 stats_file: str = None
+    ) -> None:
+
+        self.board = board if board is not None else Checkers()
+        self.transposition = TranspositionTable(transposition_size, transposition_replacement)
+        self.ordering = MoveOrdering()
+
+        self.difficulty = 5
+
+        # per move budget of the iterative deepening search, None means unlimited
+        self.time_limit = None
+        self.node_limit = None
+
+        self.nodes = 0
+        self.search_depth = 0
+        self.deadline = None
+        self.max_nodes = None
+
+        # root moves are split across this many processes when searching with alpha_beta
+        self.workers = workers
+        self.executor = None
+        self.shared_alpha = None
+        self.shared_stop = None
+
+        # score the quiet leaves below depth 1 nodes with one numpy call instead of one heuristic call each,
+        # with the material heuristic this is no faster than scoring them one by one, it is there for costlier evaluations
+        if batch_evaluation:
+            evaluation.require_numpy()
+        self.batch_evaluation = batch_evaluation
+
+        # pending captures are resolved past the nominal depth, at most this many nodes per iteration,
+        # 0 turns the quiescence search off
+        self.quiescence_limit = quiescence_limit
+        self.quiescence_nodes = 0
+        self.quiescence_stop = 0
+
+        # hooks for running the search in the background: stop_check is polled with the clock and aborts
+        # the search once it returns True, progress is called with the result of every completed iteration
+        self.stop_check: Optional[Callable[[], bool]] = None
+        self.progress: Optional[Callable[["Engine.Search_result"], None]] = None
+
+        # path of an opening book, its moves are played without searching
+        self.book = None
+        if book is not None:
+            from book import OpeningBook
+            self.book = OpeningBook(book)
+
+        # path of an endgame tablebase, positions with few enough pieces are looked up instead of searched
+        self.tablebase = None
+        if tablebase is not None:
+            from tablebase import Tablebase
+            self.tablebase = Tablebase(tablebase)
+        self.tablebase_hits = 0
+
+        # a SearchStats for every search, also appended to stats_file as json lines if given,
+        # searches without them run uninstrumented
+        self.collect_stats = collect_stats or stats_file is not None
+        self.stats_file = stats_file
+        self.stats = None
+        # of the running search, the pool processes report their counters to it
+        self.instrumentation = None
+
+
+
+    # think of this function as the 0th level of the tree
+    # it is just a minimax/alpha-beta iteration,
+    # as the actual minimax/alpha-beta functions only return the heuristic
+    # values of the nodes, this iteration will take care of also returning the best move/jump
+    # NEGAMAX BABYYYYYYYYYY
+    def get_best_move(self, player: int, algorithm: Callable, depth: int) -> (Checkers.Location, Checkers.Move):
+        if self.board.won():
+            return None
+
+        if self.book is not None:
+            entry = self.book.probe(self.board, player)
+            if entry is not None:
+                return entry.move
+
+        # the search works on its own board, so the ui can keep drawing self.board meanwhile
+        board = copy.deepcopy(self.board)
+        self.transposition.new_search()
+        self.ordering.new_search()
+        self.set_limits(None, None)
+        self.quiescence_nodes = 0
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("moves %s", self.get_player_moves(board, player))
+        best_option, best_value = self.search_root(board, player, algorithm, depth)
+
+        # we iterated all of the available moves, return the best
+        logger.debug("best move %s value %s", best_option, best_value)
+        return best_option
+
+
+    # iterative deepening: searches depth 1, 2, ... max_depth until the time or node budget is spent
+    # and returns the best move of the deepest completed iteration
+    def search(self, player: int, algorithm: Callable, max_depth: int, time_limit: float = None, node_limit: int = None) -> Search_result:
+        if self.board.won():
+            return None
+
+        if self.book is not None:
+            entry = self.book.probe(self.board, player)
+            if entry is not None:
+                result = Engine.Search_result(entry.move, entry.value, entry.depth, 0, 0.0, 0, (entry.move,))
+                if self.progress is not None:
+                    self.progress(result)
+                return result
+
+        start = time.perf_counter()
+        self.transposition.new_search()
+        self.ordering.new_search()
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.search_depth = 0
+
+        instrumentation = None
+        if self.collect_stats:
+            from stats import Instrumentation
+            instrumentation = Instrumentation(self)
+            board = instrumentation.copy_board(self.board)
+        else:
+            board = copy.deepcopy(self.board)
+        self.instrumentation = instrumentation
+
+        try:
+            best_option, best_value, best_pv = None, -inf, ()
+            for depth in range(1, max_depth + 1):
+                # the first iteration always completes unless stopped, so there is a move to return
+                self.set_limits(time_limit if depth > 1 else None, node_limit if depth > 1 else None, start)
+
+                try:
+                    best_option, best_value = self.search_root(board, player, algorithm, depth, best_option)
+                except SearchAborted:
+                    break
+
+                self.search_depth = depth
+                # read now, an aborted iteration leaves entries of its own in the transposition table
+                best_pv = self.get_principal_variation(board, player, best_option)
+                if instrumentation is not None:
+                    instrumentation.iteration(self.nodes)
+                if self.progress is not None:
+                    self.progress(Engine.Search_result(best_option, best_value, depth, self.nodes, time.perf_counter() - start,
+                                                       self.quiescence_nodes, best_pv))
+
+                if abs(best_value) == inf:
+                    # the game is decided, searching deeper will not change the outcome
+                    break
+        finally:
+            self.set_limits(None, None)
+            self.instrumentation = None
+            if instrumentation is not None:
+                self.stats = instrumentation.finish()
+                self.write_stats()
+
+        return Engine.Search_result(best_option, best_value, self.search_depth, self.nodes, time.perf_counter() - start,
+                                    self.quiescence_nodes, best_pv, self.stats if instrumentation is not None else None)
+
+
+    def write_stats(self) -> None:
+        if self.stats_file is not None:
+            with open(self.stats_file, "a") as file:
+                self.stats.write(file)
+
+
+    # follows the best moves stored in the transposition table, starting with the root move
+    def get_principal_variation(self, board: Checkers, player: int, first: Tuple, max_length: int = 32) -> Tuple:
+        if first is None:
+            return ()
+
+        pv = [first]
+        undos = [board.make_move(*first)]
+        seen = {board.hash}
+        player = -player
+
+        while len(pv) < max_length:
+            entry = self.transposition.probe(board.hash)
+            if entry is None or entry.best_move is None or not board.is_legal(player, *entry.best_move):
+                break
+
+            pv.append(entry.best_move)
+            undos.append(board.make_move(*entry.best_move))
+            player = -player
+
+            if board.hash in seen:
+                # kings going back and forth
+                break
+            seen.add(board.hash)
+
+        for undo in reversed(undos):
+            board.unmake_move(undo)
+
+        return tuple(pv)
+
+
+    # think of this function as the 0th level of the tree, first is searched before the other moves,
+    # usually the best move of the previous iteration
+    def search_root(self, board: Checkers, player: int, algorithm: Callable, depth: int, first: Tuple = None) -> Tuple[Tuple, float]:
+        player_moves = [(location, move) for location, moves in self.get_player_moves(board, player) for move in moves]
+        self.quiescence_stop = self.quiescence_nodes + self.quiescence_limit
+        if first in player_moves:
+            player_moves.remove(first)
+            player_moves.insert(0, first)
+
+        if self.workers > 1 and algorithm == self.alpha_beta and len(player_moves) > 1:
+            return self.parallel_search_root(board, player, depth, player_moves)
+
+        # the root children are ply 1, as in the parallel search, so the killer moves line up
+        options = {"ply": 1} if algorithm == self.alpha_beta else {}
+
+        best_value = -inf
+        best_option = None
+        for location, move in player_moves:
+            # apply the move on the search board, it is taken back once evaluated or once the search is aborted
+            undo = board.make_move(location, move)
+            try:
+                path_value = -algorithm(board, -player, depth - 1, **options)
+            finally:
+                board.unmake_move(undo)
+
+            # check if the computed path is worth it
+            if path_value > best_value or best_option is None:
+                best_value = path_value
+                best_option = (location, move)
+                logger.debug("depth %d root move %s %s value %s", depth, location, move, path_value)
+
+        return best_option, best_value
+
+
+    # young brothers wait: the eldest move is searched here to get a bound, its brothers are then
+    # searched in parallel by the worker processes, which all prune against the best value found so far
+    def parallel_search_root(self, board: Checkers, player: int, depth: int, player_moves: List[Tuple]) -> Tuple[Tuple, float]:
+        from concurrent.futures import wait
+
+        executor = self.get_executor()
+
+        location, move = player_moves[0]
+        undo = board.make_move(location, move)
+        try:
+            best_value = -self.alpha_beta(board, -player, depth - 1, ply = 1)
+        finally:
+            board.unmake_move(undo)
+        best_option = (location, move)
+
+        self.shared_alpha.value = best_value
+        time_limit = self.deadline - time.perf_counter() if self.deadline is not None else None
+        node_limit = self.max_nodes - self.nodes if self.max_nodes is not None else None
+
+        self.shared_stop.value = False
+        collect_stats = self.instrumentation is not None
+        futures = [executor.submit(search_root_move, board, player, option, depth, time_limit, node_limit, collect_stats)
+                   for option in player_moves[1:]]
+
+        # the pool processes cannot call stop_check, a stop is passed on to them through the shared flag
+        pending = futures
+        while pending:
+            _, pending = wait(pending, timeout = 0.01)
+            if pending and self.stop_check is not None and self.stop_check():
+                self.shared_stop.value = True
+
+        aborted = False
+        for future in futures:
+            option, value, nodes, quiescence_nodes, stats = future.result()
+            self.nodes += nodes
+            self.quiescence_nodes += quiescence_nodes
+            if stats is not None:
+                self.instrumentation.add_worker(stats)
+
+            if value is None:
+                aborted = True
+            elif value > best_value:
+                # values that did not beat the shared alpha are only upper bounds, they never get here
+                best_value = value
+                best_option = option
+
+        if aborted:
+            raise SearchAborted()
+
+        return best_option, best_value
+
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            # imported here, most engines never start a pool and short lived processes should not pay for it
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.shared_alpha = multiprocessing.Value("d", -inf)
+            self.shared_stop = multiprocessing.Value("b", False)
+            self.executor = ProcessPoolExecutor(max_workers = self.workers, initializer = init_worker,
+                                                initargs = (self.shared_alpha, self.shared_stop, self.transposition.size,
+                                                            self.transposition.replacement, self.quiescence_limit,
+                                                            self.batch_evaluation,
+                                                            self.tablebase.path if self.tablebase is not None else None))
+
+        return self.executor
+
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures = True)
+            self.executor = None
+
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+
+        if self.tablebase is not None:
+            self.tablebase.close()
+            self.tablebase = None
+
+
+    # the hash move first, if it is legal, then the other moves ordered by promotions, long captures,
+    # and the moves that caused cut-offs elsewhere in the tree
+    def get_ordered_moves(self, board: Checkers, player: Checkers.Player, ply: int, hash_move: Tuple = None) -> Iterator[Tuple]:
+        options = board.iter_actions(player, hash_move)
+
+        rest = []
+        for option in options:
+            if option == hash_move:
+                yield option
+            else:
+                rest.append(option)
+            break
+
+        rest.extend(options)
+        yield from self.ordering.order(board, rest, ply)
+
+
+    # determine whether the player is allowed to move, or if he must jump
+    def get_player_moves(self, board: Checkers, player: int) -> List[Tuple[Checkers.Location, List]]:
+        player_moves: (Location, List[Jump]) = board.get_jumps(player = player, recursive = True)
+        if not player_moves:
+            player_moves: (Location, List[Move]) = board.get_moves(player = player)
+
+        return player_moves
+
+
+    # every option of player unordered, for the nodes that evaluate all of their children
+    def get_actions(self, board: Checkers, player: Checkers.Player) -> List[Tuple]:
+        return list(board.iter_actions(player))
+
+
+    # the capture sequences of player, all the quiescence search looks at
+    def get_captures(self, board: Checkers, player: Checkers.Player) -> List[Tuple[Checkers.Location, List]]:
+        return board.get_jumps(player = player, recursive = True)
+
+
+    def can_capture(self, board: Checkers, player: Checkers.Player) -> bool:
+        return board.can_jump(player)
+
+
+    # search budget
+
+    def set_limits(self, time_limit: float, node_limit: int, start: float = None) -> None:
+        if start is None:
+            start = time.perf_counter()
+
+        self.deadline = start + time_limit if time_limit is not None else None
+        self.max_nodes = node_limit
+
+
+    # called on every node, the clock is only read every 256 nodes
+    def count_node(self) -> None:
+        self.nodes += 1
+
+        if self.nodes & 255 == 0:
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchAborted()
+            if self.stop_check is not None and self.stop_check():
+                raise SearchAborted()
+
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchAborted()
+
+
+
+
+
+
+
+
+    def negamax(self, board: Checkers, player: Checkers.Player, depth: int) -> int:
+        self.count_node()
+
+        winner = board.won()
+        if winner:
+            return inf if winner == player else -inf
+
+        if depth == 0:
+            return self.heuristic(player, board)
+
+        # determine whether the player is allowed to move, or if he must jump
+        player_moves: (Location, List[Jump]) = board.get_jumps(player = player)
+        if not player_moves:
+            player_moves: (Location, List[Move]) = board.get_moves(player = player)
+
+        best_value = -inf
+        for location, moves in player_moves:
+            for move in moves:
+                undo = board.make_move(location, move)
+                try:
+                    best_value = max(best_value, -self.negamax(board, -player, depth - 1))
+                finally:
+                    board.unmake_move(undo)
+
+        # we iterated all of the available moves, return the best
+        return best_value
+
+
+
+
+
+
+    # ply is the distance from the node the search was started from, used to index the killer moves
+    def alpha_beta(self, board: Checkers, player: Checkers.Player, depth: int, alpha: int = -inf, beta: int = inf, ply: int = 0) -> int:
+        self.count_node()
+
+        winner = board.won()
+        if winner:
+            return inf if winner == player else -inf
+
+        if self.tablebase is not None and board.white_count + board.black_count <= self.tablebase.pieces:
+            # exact, whatever the depth
+            self.tablebase_hits += 1
+            return self.tablebase.value(board, player)
+
+        if depth == 0:
+            return self.quiescence(board, player, alpha, beta)
+
+        # the same position may have been reached through another move order
+        alpha_original = alpha
+        entry = self.transposition.probe(board.hash)
+        hash_move = entry.best_move if entry else None
+        if entry and entry.depth >= depth:
+            if entry.bound == TranspositionTable.exact:
+                return entry.value
+            elif entry.bound == TranspositionTable.lower:
+                alpha = max(alpha, entry.value)
+            else:
+                beta = min(beta, entry.value)
+
+            if alpha >= beta:
+                return entry.value
+
+        # lazily, the rest is only generated if the hash move does not cut off
+        player_moves = self.get_ordered_moves(board, player, ply, hash_move)
+
+        if depth == 1 and self.batch_evaluation:
+            # every child is a leaf
+            best_value, best_option = self.evaluate_children(board, player, player_moves, alpha, beta, ply)
+        else:
+            best_value = -inf
+            best_option = None
+            for index, (location, move) in enumerate(player_moves):
+                undo = board.make_move(location, move)
+                try:
+                    value = -self.alpha_beta(board, -player, depth - 1, -beta, -alpha, ply + 1)
+                finally:
+                    board.unmake_move(undo)
+
+                if value > best_value or best_option is None:
+                    best_value = value
+                    best_option = (location, move)
+
+                alpha = max(alpha, best_value)
+
+                if alpha >= beta:
+                    # cut-off
+                    self.ordering.record_cutoff(best_option, depth, ply, index)
+                    break
+
+        if best_value <= alpha_original:
+            bound = TranspositionTable.upper
+        elif best_value >= beta:
+            bound = TranspositionTable.lower
+        else:
+            bound = TranspositionTable.exact
+        self.transposition.store(board.hash, depth, best_value, bound, best_option)
+
+        # we iterated all of the available moves, return the best
+        return best_value
+
+
+
+
+
+
+
+
+
+
+
+    # the children of a depth 1 node, scored as alpha_beta would score them at depth 0: the ones that are decided
+    # or not quiet are searched in order and can still cut off, the quiet ones are left for one numpy call at the
+    # end, so they never cut off, and only pay when evaluating a position costs more than generating it
+    def evaluate_children(self, board: Checkers, player: Checkers.Player, player_moves: Iterator[Tuple],
+                          alpha: float, beta: float, ply: int) -> Tuple[float, Optional[Tuple]]:
+        best_value = -inf
+        best_option = None
+        frontier = []
+        quiet = []
+
+        for index, option in enumerate(player_moves):
+            self.count_node()
+            undo = board.make_move(*option)
+            try:
+                winner = board.won()
+                if winner:
+                    value = inf if winner == player else -inf
+                elif self.tablebase is not None and self.tablebase.covers(board):
+                    self.tablebase_hits += 1
+                    value = -self.tablebase.value(board, -player)
+                elif self.quiescence_limit and self.can_capture(board, -player):
+                    # the child is not quiet, resolve its captures first
+                    value = -self.quiescence(board, -player, -beta, -alpha)
+                else:
+                    frontier.append([row[:] for row in board.board])
+                    quiet.append(option)
+                    continue
+            finally:
+                board.unmake_move(undo)
+
+            if value > best_value or best_option is None:
+                best_value = value
+                best_option = option
+
+            alpha = max(alpha, best_value)
+            if alpha >= beta:
+                self.ordering.record_cutoff(best_option, 1, ply, index)
+                return best_value, best_option
+
+        if frontier:
+            for option, value in zip(quiet, self.evaluate_batch(frontier, player)):
+                if value > best_value or best_option is None:
+                    best_value = value
+                    best_option = option
+
+        return best_value, best_option
+
+
+    # scores of the boards for player, the same values heuristic gives one by one
+    def evaluate_batch(self, boards: List[List[List[int]]], player: Checkers.Player) -> List[float]:
+        return evaluation.evaluate_batch(evaluation.stack(boards), player).tolist()
+
+
+    # extends the search past the horizon through forced captures only, as captures are mandatory
+    # there is no standing pat: a position is scored once the side to move has nothing to capture
+    def quiescence(self, board: Checkers, player: Checkers.Player, alpha: float, beta: float) -> float:
+        if self.quiescence_nodes >= self.quiescence_stop:
+            # out of budget, or turned off
+            return self.heuristic(player, board)
+        self.quiescence_nodes += 1
+
+        winner = board.won()
+        if winner:
+            return inf if winner == player else -inf
+
+        if self.tablebase is not None and self.tablebase.covers(board):
+            self.tablebase_hits += 1
+            return self.tablebase.value(board, player)
+
+        player_moves = self.get_captures(board, player)
+        if not player_moves:
+            return self.heuristic(player, board)
+
+        best_value = -inf
+        for location, seqs in player_moves:
+            for seq in seqs:
+                undo = board.make_move(location, seq)
+                best_value = max(best_value, -self.quiescence(board, -player, -beta, -alpha))
+                board.unmake_move(undo)
+
+                alpha = max(alpha, best_value)
+                if alpha >= beta:
+                    return best_value
+
+        return best_value
+
+
+    # negamax heuristic
+    def heuristic(self, player: Checkers.Player, board: Checkers = None) -> int:
+        if not board:
+            board = self.board
+
+        return (board.get_count(player) - board.get_count(-player))*100 + (board.get_kings_count(player) - board.get_kings_count(-player))*50
+
+
+
+
+# ------------------
+# WORKER PROCESSES
+# ------------------
+
+# every worker keeps its own engine, and so its own transposition table, for its whole life
+worker_engine: Optional[Engine] = None
+worker_alpha = None
+
+
+def init_worker(shared_alpha: "multiprocessing.Value", shared_stop: "multiprocessing.Value", transposition_size: int,
+                transposition_replacement: str, quiescence_limit: int, batch_evaluation: bool, tablebase: Optional[str]) -> None:
+    global worker_engine, worker_alpha
+    worker_engine = Engine(transposition_size = transposition_size, transposition_replacement = transposition_replacement,
+                           quiescence_limit = quiescence_limit, batch_evaluation = batch_evaluation, tablebase = tablebase)
+    # polled with the clock, set by the engine that owns the pool once it is stopped
+    worker_engine.stop_check = lambda: shared_stop.value
+    worker_alpha = shared_alpha
+
+
+# returns the value of the root move, or None if the budget ran out before it was searched, and the statistics
+# of this search if collect_stats
+def search_root_move(board: Checkers, player: int, option: Tuple, depth: int, time_limit: float, node_limit: int,
+                     collect_stats: bool = False) -> Tuple[Tuple, Optional[float], int, int, Optional["SearchStats"]]:
+    engine = worker_engine
+    engine.nodes = 0
+    engine.quiescence_nodes = 0
+    engine.quiescence_stop = engine.quiescence_limit
+    engine.transposition.new_search()
+    engine.set_limits(time_limit, node_limit)
+
+    instrumentation = None
+    if collect_stats:
+        from stats import Instrumentation
+        instrumentation = Instrumentation(engine)
+
+    location, move = option
+    board.make_move(location, move)
+    alpha = worker_alpha.value
+
+    try:
+        value = -engine.alpha_beta(board, -player, depth - 1, -inf, -alpha, 1)
+    except SearchAborted:
+        value = None
+    finally:
+        stats = instrumentation.finish() if instrumentation is not None else None
+
+    if value is None:
+        return option, None, engine.nodes, engine.quiescence_nodes, stats
+
+    if value <= alpha:
+        # failed low, only an upper bound
+        return option, -inf, engine.nodes, engine.quiescence_nodes, stats
+
+    with worker_alpha.get_lock():
+        if value > worker_alpha.value:
+            worker_alpha.value = value
+
+    return option, value, engine.nodes, engine.quiescence_nodes, stats
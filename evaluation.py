@@ -0,0 +1,53 @@
+from typing import List
+
+from checkers import Checkers
+
+# imported on first use, numpy takes longer to import than the rest of the engine
+np = None
+
+
+
+
+# vectorised version of Engine.heuristic, scores many positions in one pass,
+# both in the search frontier and offline over large position sets
+
+pawn_weight = 100
+king_weight = 50
+
+
+
+
+def require_numpy() -> None:
+    global np
+    if np is not None:
+        return
+
+    try:
+        import numpy
+    except ImportError:
+        raise Exception("NumPy is required for batched evaluation.")
+    np = numpy
+
+
+# stacks the boards into an (N, 8, 8) int8 array
+def stack(boards: List[List[List[int]]]) -> "np.ndarray":
+    require_numpy()
+    return np.array(boards, dtype = np.int8).reshape(-1, Checkers.size, Checkers.size)
+
+
+# scores of the (N, 8, 8) positions from the point of view of player, same values as Engine.heuristic
+def evaluate_batch(positions: "np.ndarray", player: Checkers.Player) -> "np.ndarray":
+    require_numpy()
+
+    pieces = np.sign(positions, dtype = np.int8)
+    kings = np.where(np.abs(positions) == 3, pieces, 0)
+
+    # black counts positive, white negative
+    balance = pieces.sum(axis = (1, 2), dtype = np.int32)
+    kings_balance = kings.sum(axis = (1, 2), dtype = np.int32)
+
+    return (balance * pawn_weight + kings_balance * king_weight) * player
+
+
+def evaluate_positions(boards: List[Checkers], player: Checkers.Player) -> "np.ndarray":
+    return evaluate_batch(stack([board.board for board in boards]), player)
@@ -1,19 +1,24 @@
 from __future__ import annotations
 
-import pygame
-
 from typing import List, Tuple, NamedTuple, Callable
 
 from checkers import *
-from gameui import *
+from engine import Engine
+from transposition import TranspositionTable
+from worker import EngineWorker
 
 from math import inf
 
-import threading
+import copy
+import logging
+
+
 
+logger = logging.getLogger(__name__)
 
 
-class Game:
+
+class Game(Engine):
 
 
     def __init__(self, display_width: int = 900, display_height: int = 900,
@@ -27,26 +32,49 @@ class Game:
                  white_sprite: str = "white.png", white_king_sprite: str = "white_king.png",
                  caption: str = "Checkers",
                  logo: str = "logo.png",
-                 auto_init: bool = True
+                 auto_init: bool = True,
+                 transposition_size: int = 1 << 16,
+                 transposition_replacement: str = TranspositionTable.depth_preferred,
+                 workers: int = 1,
+                 ponder: bool = True,
+                 batch_evaluation: bool = False,
+                 book: str = None,
+                 tablebase: str = None
     ) -> None:
 
-        self.board = Checkers()
+        Engine.__init__(self, transposition_size = transposition_size,
+                        transposition_replacement = transposition_replacement, workers = workers,
+                        batch_evaluation = batch_evaluation, book = book, tablebase = tablebase)
 
-        self.ui = GameUI(background_color = background_color, border_color = border_color, black_cell_color = black_cell_color, white_cell_color = white_cell_color, border_size = border_size, auto_init = False)
+        # pygame and the sprites are only loaded once the window is opened, by run,
+        # so the search can be used without a display
+        self.ui = None
+        self.ui_options = dict(background_color = background_color, border_color = border_color, black_cell_color = black_cell_color, white_cell_color = white_cell_color, border_size = border_size, auto_init = False)
 
         #self.cli = Gamecli()
 
-        self.difficulty = 5
-
         self.pc = Checkers.white
         self.player = Checkers.black
 
+        # the pc thinks in its own process, started with the first pc turn
+        self.worker = None
+        self.transposition_replacement = transposition_replacement
+        self.book_path = book
+        self.tablebase_path = tablebase
+
+        # think on the human's time, about the reply the search expects
+        self.ponder = ponder
+        self.ponder_hash = None
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+
 
 
     # wrapper for a default game\
     def run(self) -> None:
+        import pygame
 
-        self.ui.init_window()
+        self.get_ui().init_window()
         self.ui.draw(self.board)
         self.ui.update()
 
@@ -54,62 +82,119 @@ class Game:
         selected = None #for mouse moves
         force_pawn = None #for jump seq
         player = True
-        pc_thread = None
-
-        while run:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    run = False
-                elif event.type == pygame.MOUSEBUTTONUP:
-                    if player:
-                        pos = self.ui.mapCoordToIndex(*pygame.mouse.get_pos())
-
-                        if selected:
-                            attempt = Checkers.Pair(*pos) - Checkers.Pair(*selected)
-                            if attempt.is_move():
-                                self.board.move(Checkers.Pair(*selected), attempt)
+
+        try:
+            while run:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        run = False
+                    elif event.type == pygame.MOUSEBUTTONUP:
+                        if player:
+                            pos = self.ui.mapCoordToIndex(*pygame.mouse.get_pos())
+
+                            if selected:
+                                attempt = Checkers.Pair(*pos) - Checkers.Pair(*selected)
+                                if attempt.is_move():
+                                    self.board.move(Checkers.Pair(*selected), attempt)
+                                else:
+                                    self.board.jump(Checkers.Pair(*selected), attempt)
+                                    if self.won() != None:
+                                        #player won with a jump
+                                        self.ui.draw_winner("black")
+                                        self.ui.update()
+
+                                logger.debug("board after the human move\n%s", self.board)
+
+
+                                #self.ui.remove_pawn(*Checkers.Pair(*selected))
+                                selected = None
+                                player = False
+                                self.check_ponder()
+                                self.get_worker().start(self.board, self.pc, self.difficulty, self.time_limit, self.node_limit)
                             else:
-                                self.board.jump(Checkers.Pair(*selected), attempt)
-                                if self.won() != None:
-                                    #player won with a jump
-                                    self.ui.draw_winner("black")
-                                    self.ui.update()
+                                selected = pos
+
+                if not player:
+                    for event in self.worker.poll():
+                        if type(event) == EngineWorker.Progress:
+                            result = event.result
+                            logger.debug("depth %d value %s nodes %d pv %s", result.depth, result.value, result.nodes, result.pv)
+                        elif type(event) == EngineWorker.Error:
+                            raise Exception(event.message)
+                        else:
+                            if event.result is not None and event.result.move is not None:
+                                self.apply_result(event.result)
+                                self.start_ponder(event.result)
+                            player = True
+                            if self.won() != None:
+                                # pc won with a jump
+                                self.ui.draw_winner("pc")
+                                self.ui.update()
+                                logger.info("pc won\n%s", self.board)
+
+
+
+                self.ui.draw_changes(self.board, selected)
+                self.ui.update()
+                self.ui.clock.tick(30)
+        finally:
+            # stops a search that is still running, also when the loop raised
+            self.close()
+            pygame.quit()
 
-                            print(self.board)
 
 
-                            #self.ui.remove_pawn(*Checkers.Pair(*selected))
-                            selected = None
-                            player = False
-                            pc_thread = threading.Thread(target = self.pc_turn, daemon = True)
-                            pc_thread.start()
-                        else:
-                            selected = pos
 
-            if not player:
-                if pc_thread.is_alive():
-                    pass
-                else:
-                    pc_thread.join()
-                    player = True
-                    if self.won() != None:
-                        # pc won with a jump
-                        self.ui.draw_winner("pc")
-                        self.ui.update()
-                        print(self.board)
+    def get_ui(self) -> "GameUI":
+        if self.ui is None:
+            from gameui import GameUI
+            self.ui = GameUI(**self.ui_options)
 
+        return self.ui
 
-            
-            self.ui.display.fill((0, 0, 0))
-            self.ui.draw(self.board)
-            self.ui.update()
-            self.ui.clock.tick(30)
 
+    def get_worker(self) -> EngineWorker:
+        if self.worker is None:
+            self.worker = EngineWorker(transposition_size = self.transposition.size,
+                                       transposition_replacement = self.transposition_replacement,
+                                       workers = self.workers, quiescence_limit = self.quiescence_limit,
+                                       batch_evaluation = self.batch_evaluation,
+                                       book = self.book_path, tablebase = self.tablebase_path)
 
+        return self.worker
 
-        pygame.quit()
 
+    # the second move of the principal variation is the reply the search expects
+    def start_ponder(self, result: Engine.Search_result) -> None:
+        if not self.ponder or len(result.pv) < 2 or self.board.won():
+            return
 
+        board = copy.deepcopy(self.board)
+        board.apply(*result.pv[1])
+        self.ponder_hash = board.hash
+        self.worker.ponder(board, self.pc, self.difficulty)
+
+
+    # called once the human moved, the search that follows reuses the pondering if the guess was right
+    def check_ponder(self) -> None:
+        if self.ponder_hash is None:
+            return
+
+        if self.board.hash == self.ponder_hash:
+            self.ponder_hits += 1
+            logger.info("ponder hit")
+        else:
+            self.ponder_misses += 1
+            logger.info("ponder miss")
+        self.ponder_hash = None
+
+
+    def close(self) -> None:
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
+
+        Engine.close(self)
 
 
     def won(self) -> bool:
@@ -132,13 +217,16 @@ class Game:
 
     def pc_turn(self) -> None:
         #apply minimax
-        origin, move = self.get_best_move(self.pc, self.alpha_beta, self.difficulty)
-        print("pc moved:")
-        print(origin, move)
+        result = self.search(self.pc, self.alpha_beta, self.difficulty, self.time_limit, self.node_limit)
+        self.apply_result(result)
+
 
-        print(self.board.apply(origin, move))
+    def apply_result(self, result: Engine.Search_result) -> None:
+        origin, move = result.move
+        logger.info("pc moved %s %s, depth reached %d, nodes %d", origin, move, result.depth, result.nodes)
 
-        print(self.board)
+        outcome = self.board.apply(origin, move)
+        logger.debug("%s\n%s", outcome, self.board)
 
 
     def turn(self, player: bool) -> None:
@@ -146,126 +234,3 @@ class Game:
             self.human_turn()
         else:
             self.pc_turn()
-
-
-    # think of this function as the 0th level of the tree
-    # it is just a minimax/alpha-beta iteration,
-    # as the actual minimax/alpha-beta functions only return the heuristic
-    # values of the nodes, this iteration will take care of also returning the best move/jump
-    # NEGAMAX BABYYYYYYYYYY
-    def get_best_move(self, player: int, algorithm: Callable, depth: int) -> (Checkers.Location, Checkers.Move):
-        if self.board.won():
-            return None
-
-        # determine whether the player is allowed to move, or if he must jump
-        player_moves: (Location, List[Jump]) = self.board.get_jumps(player = player, recursive = True)
-        if not player_moves:
-            player_moves: (Location, List[Move]) = self.board.get_moves(player = player)
-
-        best_value = -inf
-        best_option = None
-        print(player_moves)
-        for location, moves in player_moves:
-            for move in moves:
-                # generate the new board configuration
-                new_board = copy.deepcopy(self.board)
-                new_board.apply(location, move)
-
-                path_value = -algorithm(new_board, -player, depth - 1)
-
-                # check if the computed path is worth it
-                if path_value >= best_value:
-                    print("OKOKOKOKOK")
-                    best_value = path_value
-                    best_option = (location, move)
-
-        # we iterated all of the available moves, return the best
-        print(best_value, "###############")
-        print(best_option)
-        return best_option
-
-
-
-
-
-
-
-
-    def negamax(self, board: Checkers, player: Checkers.Player, depth: int) -> int:
-        winner = self.board.won()
-        if winner:
-            return inf if winner == player else -inf
-
-        if depth == 0:
-            return self.heuristic(player, board)
-
-        # determine whether the player is allowed to move, or if he must jump
-        player_moves: (Location, List[Jump]) = board.get_jumps(player = player)
-        if not player_moves:
-            player_moves: (Location, List[Move]) = board.get_moves(player = player)
-
-        best_value = -inf
-        for location, moves in player_moves:
-            for move in moves:
-                # generate the new board configuration
-                new_board = copy.deepcopy(board)
-                new_board.apply(location, move)
-
-                best_value = max(best_value, -self.negamax(new_board, -player, depth - 1))
-
-        # we iterated all of the available moves, return the best
-        return best_value
-
-
-
-    
-
-
-    def alpha_beta(self, board: Checkers, player: Checkers.Player, depth: int, alpha: int = -inf, beta: int = inf) -> int:
-        winner = self.board.won()
-        if winner:
-            return inf if winner == player else -inf
-
-        if depth == 0:
-            return self.heuristic(player, board)
-
-        # prioritize moves that end in a promotion, requires some sorting of sort,
-        # must check if sorting on every node is better than pruning (it should be for huge depths)
-        player_moves: (Location, List[Jump]) = board.get_jumps(player = player, recursive = True)
-        if not player_moves:
-            player_moves: (Location, List[Move]) = board.get_moves(player = player)
-
-        best_value = -inf
-        for location, moves in player_moves:
-            for move in moves:
-                # generate the new board configuration
-                new_board = copy.deepcopy(board)
-                new_board.apply(location, move)
-
-                best_value = max(best_value, -self.alpha_beta(new_board, -player, depth - 1, -beta, -alpha))
-                alpha = max(alpha, best_value)
-
-                if alpha >= beta:
-                    # cut-off
-                    break
-
-        # we iterated all of the available moves, return the best
-        return best_value
-
-
-
-
-
-
-
-
-
-
-
-    # negamax heuristic
-    def heuristic(self, player: Player, board: Checkers = None) -> int:
-        if not board:
-            board = self.board
-
-        return (board.get_count(player) - board.get_count(-player))*100 + (board.get_kings_count(player) - board.get_kings_count(-player))*50
-
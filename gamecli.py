@@ -1,3 +1,5 @@
+from typing import Tuple
+
 from checkers import *
 from math import inf
 
@@ -42,11 +44,11 @@ class GameCLI:
 
 
 
-    def parse_input(self, attempt: str) -> Tuple[Pair, Pair]:
+    def parse_input(self, attempt: str) -> Tuple[Checkers.Pair, Checkers.Pair]:
         #5a 4b
         attempt = attempt.split(' ')
-        origin = Pair(int(attempt[0][0]), ord(attempt[0][1]) - 97)
-        move = Pair(int(attempt[1][0]) - origin.row, ord(attempt[1][1]) - 97 - origin.col)
+        origin = Checkers.Pair(int(attempt[0][0]), ord(attempt[0][1]) - 97)
+        move = Checkers.Pair(int(attempt[1][0]) - origin.row, ord(attempt[1][1]) - 97 - origin.col)
 
         return (origin, move)
 
@@ -51,10 +51,12 @@ class GameUI:
         # ---- SAVING SPRITES
         # ----
 
-        self.black_pawn = pygame.transform.scale(pygame.image.load(black_sprite), (cell_width, cell_height))
-        self.black_king = pygame.transform.scale(pygame.image.load(black_king_sprite), (cell_width, cell_height))
-        self.white_pawn = pygame.transform.scale(pygame.image.load(white_sprite), (cell_width, cell_height))
-        self.white_king = pygame.transform.scale(pygame.image.load(white_king_sprite), (cell_width, cell_height))
+        # loaded by init_window, once there is a display to convert them for
+        self.sprites = (black_sprite, black_king_sprite, white_sprite, white_king_sprite)
+        self.black_pawn = None
+        self.black_king = None
+        self.white_pawn = None
+        self.white_king = None
 
 
         # ----
@@ -72,6 +74,14 @@ class GameUI:
         self.board_rect = self.board.get_rect(center = pygame.Rect(0, 0, 900, 900).center)
         self.draw_cells_on(self.board)
 
+        # the empty board never changes, dirty cells are restored from it
+        self.cells = self.board.copy()
+
+        # what is currently on screen, so that only the cells that changed get redrawn
+        self.drawn = None
+        self.drawn_selected = None
+        self.dirty = []
+
         # border mask
         self.border = pygame.Surface((self.board_width + 2*border_size, self.board_height + 2*border_size))
         self.border.fill(border_color)
@@ -79,7 +89,7 @@ class GameUI:
 
         # window init
         self.caption = caption
-        self.logo = pygame.transform.scale(pygame.image.load(logo), (32, 32))
+        self.logo = logo
         if auto_init:
             self.init_window()
 
@@ -92,11 +102,22 @@ class GameUI:
 
 
     def init_window(self) -> None:
-        pygame.display.set_icon(self.logo)
+        pygame.display.set_icon(pygame.transform.scale(pygame.image.load(self.logo), (32, 32)))
         pygame.font.init()
         self.display = pygame.display.set_mode((self.display_width, self.display_height))
         pygame.display.set_caption(self.caption)
         self.clock = pygame.time.Clock()
+        self.load_sprites()
+
+
+    def load_sprites(self) -> None:
+        if self.black_pawn is not None:
+            return
+
+        size = (self.cell_width, self.cell_height)
+        # converted to the display format, so blitting them does not convert them again every frame
+        self.black_pawn, self.black_king, self.white_pawn, self.white_king = \
+            [pygame.transform.scale(pygame.image.load(sprite), size).convert_alpha() for sprite in self.sprites]
 
 
     def draw_background(self) -> None:
@@ -157,17 +178,65 @@ class GameUI:
         text_rect = text.get_rect()
 
 
-        self.display.blit(text, ((self.display_width - text_rect.width)/ 2, 0))
+        self.dirty.append(self.display.blit(text, ((self.display_width - text_rect.width)/ 2, 0)))
 
 
 
     def draw(self, config: "Checkers") -> None:
         self.draw_background()
         self.draw_border()
-        self.draw_cells_on(self.board)
+        self.board.blit(self.cells, (0, 0))
         self.draw_pawns_on(config, self.board)
         self.draw_board()
 
+        self.drawn = [row[:] for row in config.board]
+        self.drawn_selected = None
+        self.dirty = [self.display.get_rect()]
+
+
+    # redraws only the cells whose pawn or selection changed since the last draw, the screen is updated
+    # with just those cells on the next update
+    def draw_changes(self, config: "Checkers", selected: (int, int) = None) -> None:
+        if self.drawn is None:
+            self.draw(config)
+
+        cells = set()
+        for i in range(8):
+            for j in range(8):
+                if config.board[i][j] != self.drawn[i][j]:
+                    cells.add((i, j))
+
+        if selected != self.drawn_selected:
+            for cell in (selected, self.drawn_selected):
+                if cell is not None and 0 <= cell[0] < 8 and 0 <= cell[1] < 8:
+                    cells.add(tuple(cell))
+
+        for i, j in cells:
+            self.dirty.append(self.draw_cell(config, i, j, (i, j) == selected))
+            self.drawn[i][j] = config.board[i][j]
+
+        self.drawn_selected = selected
+
+
+    # draws a single cell straight onto the display, returns the area it covers
+    def draw_cell(self, config: "Checkers", row: int, col: int, selected: bool = False) -> "pygame.Rect":
+        x, y = self.mapIndexToCoord(row, col)
+        area = pygame.Rect(x, y, self.cell_width, self.cell_height)
+        rect = area.move(self.board_rect.topleft)
+
+        self.display.blit(self.cells, rect, area)
+
+        location = config.Location(row, col)
+        if config.is_black(location):
+            self.display.blit(self.black_king if config.is_king(location) else self.black_pawn, rect)
+        elif config.is_white(location):
+            self.display.blit(self.white_king if config.is_king(location) else self.white_pawn, rect)
+
+        if selected:
+            pygame.draw.rect(self.display, self.highlight, rect, 3)
+
+        return rect
+
 
     def mapIndexToCoord(self, row: int, col: int) -> (int, int):
         return self.cell_width * col, self.cell_height * row
@@ -193,6 +262,9 @@ class GameUI:
         pygame.quit()
 
 
+    # only the areas drawn since the last update are sent to the screen, nothing at all when idle
     def update(self) -> None:
-        pygame.display.update()
+        if self.dirty:
+            pygame.display.update(self.dirty)
+            self.dirty = []
         
\ No newline at end of file
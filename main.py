@@ -1,3 +1,5 @@
+import logging
+
 from game import *
 
 
@@ -65,6 +67,9 @@ if __name__ == "__main__":
 
     # rect = pygame.draw.rect(screen, (200, 200, 200), (0, 0, 100, 100))
 
+    # the moves of the pc on the console, DEBUG also shows the boards and the search progress
+    logging.basicConfig(level = logging.INFO, format = "%(message)s")
+
     game = Game(background_color = (48, 25, 52), border_color = (120, 24, 74), black_cell_color = (48, 25, 52), white_cell_color = (120, 24, 74), border_size = 1)
     game.run()
 
@@ -0,0 +1,383 @@
+import copy
+import logging
+import math
+import random
+import time
+
+from array import array
+from typing import Callable, List, Optional, Tuple
+
+from checkers import Checkers
+from engine import Engine
+
+
+
+
+logger = logging.getLogger(__name__)
+
+
+
+
+# monte carlo tree search: an anytime alternative to alpha_beta, every playout walks down the tree by uct,
+# adds the children of the leaf it reaches, finishes the game with quick moves and backs the result up
+
+
+
+
+# the tree lives in flat arrays indexed by node, the children of a node are allocated together
+class NodePool:
+
+    unexpanded = -1
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.child_count = array("i")
+        self.visits = array("i")
+        # summed results, from the point of view of the player who made the move leading to the node
+        self.reward = array("d")
+        # zobrist hash of the position, 0 until the node is first visited
+        self.hash = array("Q")
+        self.move: List[Optional[Tuple]] = []
+
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+
+    def full(self, count: int = 0) -> bool:
+        return len(self.parent) + count > self.capacity
+
+
+    def add(self, parent: int, move: Optional[Tuple], key: int = 0) -> int:
+        self.parent.append(parent)
+        self.first_child.append(NodePool.unexpanded)
+        self.child_count.append(0)
+        self.visits.append(0)
+        self.reward.append(0.0)
+        self.hash.append(key)
+        self.move.append(move)
+
+        return len(self.parent) - 1
+
+
+    def expand(self, node: int, moves: List[Tuple]) -> None:
+        first = len(self.parent)
+        for move in moves:
+            self.add(node, move)
+
+        self.first_child[node] = first
+        self.child_count[node] = len(moves)
+
+
+    def children(self, node: int) -> range:
+        first = self.first_child[node]
+        return range(first, first + self.child_count[node]) if first != NodePool.unexpanded else range(0)
+
+
+    # a new pool holding only the subtree of root, which becomes node 0
+    def compact(self, root: int) -> "NodePool":
+        pool = NodePool(self.capacity)
+        pool.add(-1, None, self.hash[root])
+        pool.visits[0] = self.visits[root]
+        pool.reward[0] = self.reward[root]
+
+        pending = [(root, 0)]
+        while pending:
+            old, new = pending.pop()
+            if self.first_child[old] == NodePool.unexpanded:
+                continue
+
+            first = len(pool)
+            pool.first_child[new] = first
+            pool.child_count[new] = self.child_count[old]
+            for offset, child in enumerate(self.children(old)):
+                pool.add(new, self.move[child], self.hash[child])
+                pool.visits[first + offset] = self.visits[child]
+                pool.reward[first + offset] = self.reward[child]
+                pending.append((child, first + offset))
+
+        return pool
+
+
+
+
+class MctsEngine(Engine):
+
+    random_playouts = "random"
+    # captures and promotions first, random otherwise
+    greedy_playouts = "greedy"
+
+
+
+    def __init__(self, board: Checkers = None,
+                 playouts: int = 2000,
+                 exploration: float = 1.4,
+                 playout_depth: int = 40,
+                 playout_policy: str = greedy_playouts,
+                 max_nodes: int = 1 << 20,
+                 seed: int = None,
+                 **options
+    ) -> None:
+
+        Engine.__init__(self, board, **options)
+
+        if playout_policy not in (MctsEngine.random_playouts, MctsEngine.greedy_playouts):
+            raise Exception("Invalid playout policy.")
+
+        # playouts per move unless node_limit is given to search
+        self.playouts = playouts
+        self.exploration = exploration
+        # playouts are cut here and scored by the heuristic
+        self.playout_depth = playout_depth
+        self.playout_policy = playout_policy
+        self.max_tree_nodes = max_nodes
+        self.random = random.Random(seed)
+
+        # kept between searches, the subtree of the position actually reached is reused
+        self.pool: Optional[NodePool] = None
+        self.reused = 0
+
+
+
+    # algorithm and max_depth are there to match Engine.search, the budget is node_limit playouts, or
+    # self.playouts, and time_limit seconds
+    def search(self, player: int, algorithm: Callable = None, max_depth: int = None, time_limit: float = None,
+               node_limit: int = None) -> Engine.Search_result:
+        if self.board.won():
+            return None
+
+        if self.book is not None:
+            entry = self.book.probe(self.board, player)
+            if entry is not None:
+                return Engine.Search_result(entry.move, entry.value, entry.depth, 0, 0.0, 0, (entry.move,))
+
+        start = time.perf_counter()
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.search_depth = 0
+
+        instrumentation = None
+        if self.collect_stats:
+            from stats import Instrumentation
+            instrumentation = Instrumentation(self)
+            board = instrumentation.copy_board(self.board)
+        else:
+            board = copy.deepcopy(self.board)
+
+        if player != board.player:
+            # the tree and the playouts go by the side to move of the board, and its hash
+            board.switch_player()
+
+        self.set_limits(time_limit, None, start)
+        budget = node_limit if node_limit is not None else self.playouts
+
+        pool = self.get_tree(board)
+        report = max(budget // 10, 1)
+
+        try:
+            while self.nodes < budget:
+                depth = self.playout(pool, board)
+                self.nodes += 1
+                self.search_depth = max(self.search_depth, depth)
+
+                if self.nodes & 63 == 0:
+                    if self.deadline is not None and time.perf_counter() >= self.deadline:
+                        break
+                    if self.stop_check is not None and self.stop_check():
+                        break
+
+                if self.progress is not None and self.nodes % report == 0:
+                    self.progress(self.get_result(pool, start))
+        finally:
+            self.set_limits(None, None)
+            if instrumentation is not None:
+                self.stats = instrumentation.finish()
+                self.write_stats()
+
+        result = self.get_result(pool, start)
+        if instrumentation is not None:
+            result = result._replace(stats = self.stats)
+        logger.debug("mcts %d playouts, %d nodes, %d reused, best %s", self.nodes, len(pool), self.reused, result.move)
+
+        return result
+
+
+    def get_best_move(self, player: int, algorithm: Callable = None, depth: int = None) -> Tuple:
+        result = self.search(player, algorithm, depth)
+        return result.move if result is not None else None
+
+
+    # the subtree of this position if it was searched before, two plies down at most, a new tree otherwise
+    def get_tree(self, board: Checkers) -> NodePool:
+        pool = self.pool
+        self.reused = 0
+
+        if pool is not None:
+            candidates = [0] + [child for child in pool.children(0)]
+            candidates += [grandchild for child in candidates[1:] for grandchild in pool.children(child)]
+            for node in candidates:
+                if pool.hash[node] == board.hash:
+                    self.pool = pool.compact(node) if node != 0 else pool
+                    self.reused = self.pool.visits[0]
+                    return self.pool
+
+        self.pool = NodePool(self.max_tree_nodes)
+        self.pool.add(-1, None, board.hash)
+        return self.pool
+
+
+
+    # -------
+    # PLAYOUT
+    # -------
+
+    # one selection, expansion, simulation and backup, returns the depth of the leaf
+    def playout(self, pool: NodePool, board: Checkers) -> int:
+        node = 0
+        path = [0]
+        undos = []
+
+        # selection
+        while pool.child_count[node] > 0:
+            node = self.select(pool, node)
+            undos.append(board.make_move(*pool.move[node]))
+            path.append(node)
+            if pool.hash[node] == 0:
+                pool.hash[node] = board.hash
+
+        # expansion, leaves are only expanded once visited, the root always
+        if pool.first_child[node] == NodePool.unexpanded and (pool.visits[node] > 0 or node == 0) and not board.won():
+            moves = self.get_actions(board, board.player)
+            if not pool.full(len(moves)):
+                pool.expand(node, moves)
+                if moves:
+                    node = pool.first_child[node]
+                    undos.append(board.make_move(*pool.move[node]))
+                    path.append(node)
+                    pool.hash[node] = board.hash
+
+        # simulation, the result is for the side to move at the leaf
+        result = self.simulate(board)
+
+        for undo in reversed(undos):
+            board.unmake_move(undo)
+
+        # backup, every node is scored for the player who moved into it
+        value = 1.0 - result
+        for node in reversed(path):
+            pool.visits[node] += 1
+            pool.reward[node] += value
+            value = 1.0 - value
+
+        return len(path) - 1
+
+
+    # unvisited children first, then upper confidence bound
+    def select(self, pool: NodePool, node: int) -> int:
+        visits = pool.visits
+        reward = pool.reward
+        scale = self.exploration * math.sqrt(math.log(max(visits[node], 1)))
+
+        best, best_score = -1, -math.inf
+        for child in pool.children(node):
+            if visits[child] == 0:
+                return child
+
+            score = reward[child] / visits[child] + scale / math.sqrt(visits[child])
+            if score > best_score:
+                best, best_score = child, score
+
+        return best
+
+
+    # plays the game on until it ends or playout_depth moves, 1 if the side to move at the start wins,
+    # 0 if it loses, in between for positions scored by the heuristic or the tablebase
+    def simulate(self, board: Checkers) -> float:
+        player = board.player
+        undos = []
+        result = None
+
+        for _ in range(self.playout_depth):
+            winner = board.won()
+            if winner:
+                result = 1.0 if winner == player else 0.0
+                break
+
+            if self.tablebase is not None and self.tablebase.covers(board):
+                value = self.tablebase.value(board, board.player)
+                result = 0.5 if value == 0 else float((value > 0) == (board.player == player))
+                break
+
+            moves = self.get_actions(board, board.player)
+            if not moves:
+                # no moves left, the side to move loses
+                result = 0.0 if board.player == player else 1.0
+                break
+
+            undos.append(board.make_move(*self.choose(board, moves)))
+
+        if result is None:
+            result = self.score(board, player)
+
+        for undo in reversed(undos):
+            board.unmake_move(undo)
+
+        return result
+
+
+    def choose(self, board: Checkers, moves: List[Tuple]) -> Tuple:
+        if self.playout_policy == MctsEngine.greedy_playouts:
+            longest = max(len(action) if type(action) == list else 0 for _, action in moves)
+            if longest > 1:
+                moves = [move for move in moves if type(move[1]) == list and len(move[1]) == longest]
+
+            promotions = [move for move in moves if self.promotes(board, move)]
+            if promotions:
+                moves = promotions
+
+        return self.random.choice(moves)
+
+
+    @staticmethod
+    def promotes(board: Checkers, move: Tuple) -> bool:
+        location, action = move
+        pawn_type = board.board[location.row][location.col]
+        destination = Checkers.get_destination(location, action)
+
+        return (pawn_type == Checkers.black and destination.row == 0) or \
+               (pawn_type == Checkers.white and destination.row == Checkers.size - 1)
+
+
+    # heuristic mapped to a winning chance, a pawn up is about 0.66
+    def score(self, board: Checkers, player: Checkers.Player) -> float:
+        return 0.5 + 0.5 * math.tanh(self.heuristic(player, board) / 300)
+
+
+
+    # ------
+    # RESULT
+    # ------
+
+    # the most visited moves, the first one is played
+    def get_result(self, pool: NodePool, start: float) -> Engine.Search_result:
+        pv = []
+        best = None
+        node = 0
+        while pool.child_count[node] > 0:
+            node = max(pool.children(node), key = pool.visits.__getitem__)
+            if pool.visits[node] == 0:
+                break
+            if best is None:
+                best = node
+            pv.append(pool.move[node])
+
+        if best is None:
+            return Engine.Search_result(None, -math.inf, 0, self.nodes, time.perf_counter() - start)
+
+        chance = min(max(pool.reward[best] / pool.visits[best], 0.001), 0.999)
+
+        # back on the heuristic scale, inverse of score
+        return Engine.Search_result(pv[0], 300 * math.atanh(2 * chance - 1), self.search_depth, self.nodes,
+                                    time.perf_counter() - start, 0, tuple(pv))
@@ -0,0 +1,94 @@
+from typing import Dict, List, Tuple, Union
+
+from checkers import Checkers
+
+
+
+
+class MoveOrdering:
+
+    # just an alias, (location, action) as searched by Game.alpha_beta
+    Option = Tuple[Checkers.Location, Union[Checkers.Move, List[Checkers.Jump]]]
+
+    # moves are identified by where they start and where they end
+    Key = Tuple[Checkers.Location, Checkers.Location]
+
+
+
+    # ----------------
+    # PUBLIC FUNCTIONS
+    # ----------------
+
+    def __init__(self, killers_per_ply: int = 2) -> None:
+        self.killers_per_ply = killers_per_ply
+        self.killers: List[List[MoveOrdering.Key]] = []
+        self.history: Dict[MoveOrdering.Key, int] = {}
+        self.reset_stats()
+
+
+    def reset_stats(self) -> None:
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+
+    # killers only make sense within one search, the history is kept but aged
+    def new_search(self) -> None:
+        self.killers = []
+        for key in self.history:
+            self.history[key] //= 2
+        self.reset_stats()
+
+
+    @staticmethod
+    def get_key(option: Option) -> Key:
+        location, action = option
+        return location, Checkers.get_destination(location, action)
+
+
+    # best first: moves ending in a promotion, then the longest captures, then the killer moves of this ply,
+    # then by history, the hash move is not among the options, it is searched before them
+    def order(self, board: Checkers, options: List[Option], ply: int) -> List[Option]:
+        killers = self.killers[ply] if ply < len(self.killers) else []
+        history = self.history
+
+        def score(option: MoveOrdering.Option) -> Tuple[bool, int, int, int]:
+            location, action = option
+            key = MoveOrdering.get_key(option)
+            destination = key[1]
+            pawn_type = board.board[location.row][location.col]
+
+            promotion = (pawn_type == Checkers.black and destination.row == 0) or \
+                        (pawn_type == Checkers.white and destination.row == Checkers.size - 1)
+            captures = len(action) if type(action) == list else int(Checkers.is_capture(action))
+            killer = len(killers) - killers.index(key) if key in killers else 0
+
+            return promotion, captures, killer, history.get(key, 0)
+
+        return sorted(options, key = score, reverse = True)
+
+
+    # index is the position of the move in the ordered list, 0 means the ordering got it right
+    def record_cutoff(self, option: Option, depth: int, ply: int, index: int) -> None:
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        if Checkers.is_capture(option[1]):
+            # captures are already ordered first
+            return
+
+        key = MoveOrdering.get_key(option)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+        while len(self.killers) <= ply:
+            self.killers.append([])
+
+        killers = self.killers[ply]
+        if key in killers:
+            killers.remove(key)
+        killers.insert(0, key)
+        del killers[self.killers_per_ply:]
+
+
+    def first_move_cutoff_rate(self) -> float:
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
@@ -0,0 +1,198 @@
+import argparse
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from checkers import Checkers
+from bitboard import Bitboard
+
+
+
+
+# counts the leaf nodes of the move tree, the standard way of checking a move generator
+# and of measuring its speed
+
+
+
+
+class Reference(NamedTuple):
+    board: List[List[int]]
+    player: int
+    # published leaf counts indexed by depth - 1, empty when none are known,
+    # such positions are checked by comparing both move generators instead
+    expected: List[int]
+
+
+
+
+# ---------------------
+# REFERENCE POSITIONS
+# ---------------------
+
+REFERENCES: Dict[str, Reference] = {
+    # english draughts from the initial position, black moves first
+    "start": Reference(Checkers.default_board, Checkers.black,
+                       [7, 49, 302, 1469, 7361, 36768, 179740, 845931, 3963680, 18391564]),
+
+    # kings on both sides, long backward jump chains
+    "kings": Reference([
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, -1, 0, -1, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, -1, 0, -1, 0, 0, 0],
+        [0, 0, 0, 3, 0, 0, 0, 0],
+        [0, 0, -3, 0, -1, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [3, 0, 0, 0, 0, 0, 0, 0],
+    ], Checkers.black, []),
+
+    # men one step away from promotion on both sides
+    "promotion": Reference([
+        [0, 0, 0, -1, 0, 0, 0, 0],
+        [1, 0, 0, 0, 1, 0, 0, 0],
+        [0, 0, 0, -1, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 1, 0, 0, 0],
+        [0, -1, 0, 0, 0, 0, 0, -1],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+    ], Checkers.white, []),
+
+    # crowded middle game with captures available to both sides
+    "middle": Reference([
+        [0, -1, 0, -1, 0, 0, 0, -1],
+        [-1, 0, 0, 0, -1, 0, -1, 0],
+        [0, -1, 0, -1, 0, 0, 0, 0],
+        [0, 0, 1, 0, 0, 0, -1, 0],
+        [0, 0, 0, 0, 0, 1, 0, 0],
+        [1, 0, 1, 0, 0, 0, 1, 0],
+        [0, 1, 0, 0, 0, 1, 0, 1],
+        [1, 0, 1, 0, 1, 0, 0, 0],
+    ], Checkers.black, []),
+}
+
+
+
+
+# -----
+# PERFT
+# -----
+
+def get_options(board: Checkers, player: int) -> List:
+    player_moves = board.get_jumps(player = player, recursive = True)
+    if not player_moves:
+        player_moves = board.get_moves(player = player)
+
+    return [(location, move) for location, moves in player_moves for move in moves]
+
+
+def perft(board: Checkers, player: int, depth: int) -> int:
+    options = get_options(board, player)
+    if depth == 1:
+        return len(options)
+
+    nodes = 0
+    for location, move in options:
+        undo = board.make_move(location, move)
+        nodes += perft(board, -player, depth - 1)
+        board.unmake_move(undo)
+
+    return nodes
+
+
+def perft_bitboard(bitboard: Bitboard, player: int, depth: int) -> int:
+    actions = bitboard.get_actions(player)
+    if depth == 1:
+        return len(actions)
+
+    return sum(perft_bitboard(bitboard.apply(path), -player, depth - 1) for path in actions)
+
+
+# leaf counts per root move, to narrow a mismatch down
+def divide(board: Checkers, player: int, depth: int) -> Dict[str, int]:
+    counts = {}
+    for location, move in get_options(board, player):
+        undo = board.make_move(location, move)
+        counts[f"{location} {move}"] = perft(board, -player, depth - 1) if depth > 1 else 1
+        board.unmake_move(undo)
+
+    return counts
+
+
+
+
+# ------
+# RUNNER
+# ------
+
+class Result(NamedTuple):
+    position: str
+    backend: str
+    depth: int
+    nodes: int
+    seconds: float
+    expected: Optional[int]
+
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def passed(self) -> bool:
+        return self.expected is None or self.expected == self.nodes
+
+
+def run(name: str, backend: str, depth: int) -> Result:
+    reference = REFERENCES[name]
+
+    start = time.perf_counter()
+    if backend == "checkers":
+        nodes = perft(Checkers(reference.board, reference.player), reference.player, depth)
+    elif backend == "bitboard":
+        nodes = perft_bitboard(Bitboard.from_board(reference.board), reference.player, depth)
+    else:
+        raise Exception("Invalid backend.")
+    seconds = time.perf_counter() - start
+
+    expected = reference.expected[depth - 1] if depth <= len(reference.expected) else None
+
+    return Result(name, backend, depth, nodes, seconds, expected)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description = "Perft benchmark and move generator check.")
+    parser.add_argument("--depth", type = int, default = 6)
+    parser.add_argument("--position", choices = ["all"] + list(REFERENCES), default = "all")
+    parser.add_argument("--backend", choices = ["checkers", "bitboard", "both"], default = "both")
+    parser.add_argument("--divide", action = "store_true", help = "print the leaf count of every root move")
+    args = parser.parse_args(argv)
+
+    names = list(REFERENCES) if args.position == "all" else [args.position]
+    backends = ["checkers", "bitboard"] if args.backend == "both" else [args.backend]
+
+    failed = False
+    for name in names:
+        if args.divide:
+            reference = REFERENCES[name]
+            for move, count in divide(Checkers(reference.board, reference.player), reference.player, args.depth).items():
+                print(f"{name}\t{move}\t{count}")
+
+        for depth in range(1, args.depth + 1):
+            results = [run(name, backend, depth) for backend in backends]
+
+            for result in results:
+                status = "ok" if result.passed() else f"FAIL expected {result.expected}"
+                print(f"{name:10} {result.backend:9} depth {depth:2} {result.nodes:12} nodes "
+                      f"{result.seconds:9.3f}s {result.nodes_per_second():12.0f} nodes/s  {status}")
+                failed = failed or not result.passed()
+
+            # positions without published counts are checked by agreement of the generators
+            if len({result.nodes for result in results}) > 1:
+                print(f"{name:10} MISMATCH between backends at depth {depth}")
+                failed = True
+
+    return 1 if failed else 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+from typing import Tuple
+
+from checkers import Checkers
+from bitboard import Bitboard
+
+
+
+
+# compact, immutable snapshot of a Checkers board: the 32 playable squares packed into three 32 bit masks
+# plus the side to move, meant for caches and datasets holding millions of positions
+
+class Position:
+
+    __slots__ = ("black", "white", "kings", "player")
+
+    # size of to_bytes()
+    packed_size = 13
+
+
+
+    def __init__(self, black: int, white: int, kings: int, player: Checkers.Player = Checkers.black) -> None:
+        object.__setattr__(self, "black", black)
+        object.__setattr__(self, "white", white)
+        object.__setattr__(self, "kings", kings)
+        object.__setattr__(self, "player", player)
+
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise Exception("Position is immutable.")
+
+
+    def __delattr__(self, name: str) -> None:
+        raise Exception("Position is immutable.")
+
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Position):
+            return NotImplemented
+
+        return self.key() == other.key()
+
+
+    def __hash__(self) -> int:
+        return hash(self.key())
+
+
+    def __repr__(self) -> str:
+        return f"Position(0x{self.black:08x}, 0x{self.white:08x}, 0x{self.kings:08x}, {self.player})"
+
+
+    # copying an immutable object is free
+    def __copy__(self) -> "Position":
+        return self
+
+
+    def __deepcopy__(self, memo: dict) -> "Position":
+        return self
+
+
+    def __reduce__(self) -> Tuple:
+        return Position, (self.black, self.white, self.kings, self.player)
+
+
+    # all the state in a single int
+    def key(self) -> int:
+        return (((self.black << 32 | self.white) << 32 | self.kings) << 1) | (self.player == Checkers.white)
+
+
+    # ----------
+    # CONVERSION
+    # ----------
+
+    @staticmethod
+    def from_bitboard(bitboard: Bitboard, player: Checkers.Player = Checkers.black) -> "Position":
+        return Position(bitboard.black, bitboard.white, bitboard.kings, player)
+
+
+    def to_bitboard(self) -> Bitboard:
+        return Bitboard(self.black, self.white, self.kings)
+
+
+    @staticmethod
+    def from_checkers(checkers: Checkers) -> "Position":
+        return Position.from_bitboard(Bitboard.from_checkers(checkers), checkers.player)
+
+
+    def to_checkers(self) -> Checkers:
+        return Checkers(self.to_bitboard().to_board(), self.player)
+
+
+    def to_bytes(self) -> bytes:
+        return self.black.to_bytes(4, "little") + self.white.to_bytes(4, "little") + \
+               self.kings.to_bytes(4, "little") + (b"\x01" if self.player == Checkers.white else b"\x00")
+
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "Position":
+        if len(data) != Position.packed_size:
+            raise Exception("Invalid packed position.")
+
+        return Position(int.from_bytes(data[0:4], "little"), int.from_bytes(data[4:8], "little"),
+                        int.from_bytes(data[8:12], "little"), Checkers.white if data[12] else Checkers.black)
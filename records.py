@@ -0,0 +1,108 @@
+import mmap
+import os
+import struct
+
+from typing import Iterable, Iterator, Optional, Tuple
+
+
+
+
+# a file of fixed size records sorted by a leading 64 bit key, searched in place through mmap:
+# processes opening the same file share its pages and nothing is loaded into the heap
+
+class RecordFile:
+
+    key_format = struct.Struct("<Q")
+
+    # magic, then the record size, so that a file is never read with the wrong layout
+    header = struct.Struct("<8sI")
+
+
+
+    # ----------------
+    # PUBLIC FUNCTIONS
+    # ----------------
+
+    def __init__(self, path: str, record: struct.Struct, magic: bytes) -> None:
+        self.path = path
+        self.record = record
+
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < RecordFile.header.size:
+            self.file.close()
+            raise Exception("Invalid record file.")
+
+        self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        file_magic, record_size = RecordFile.header.unpack_from(self.data, 0)
+        if file_magic != magic or record_size != record.size or (size - RecordFile.header.size) % record.size:
+            self.close()
+            raise Exception("Invalid record file.")
+
+        self.count = (size - RecordFile.header.size) // record.size
+
+
+    def __len__(self) -> int:
+        return self.count
+
+
+    def __enter__(self) -> "RecordFile":
+        return self
+
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+    # the mmap is not picklable, worker processes open the file again by path
+    def __reduce__(self) -> Tuple:
+        return RecordFile, (self.path, self.record, RecordFile.header.unpack_from(self.data, 0)[0])
+
+
+    def close(self) -> None:
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+
+    # binary search, the record with this key or None
+    def find(self, key: int) -> Optional[Tuple]:
+        data = self.data
+        record_size = self.record.size
+        base = RecordFile.header.size
+        unpack_key = RecordFile.key_format.unpack_from
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            middle_key = unpack_key(data, base + middle * record_size)[0]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                return self.record.unpack_from(data, base + middle * record_size)
+
+        return None
+
+
+    def __iter__(self) -> Iterator[Tuple]:
+        for index in range(self.count):
+            yield self.record.unpack_from(self.data, RecordFile.header.size + index * self.record.size)
+
+
+    # the first field of every record is the key, the file is replaced only once it is complete
+    @staticmethod
+    def write(path: str, record: struct.Struct, magic: bytes, records: Iterable[Tuple]) -> int:
+        records = sorted(records, key = lambda values: values[0])
+
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(RecordFile.header.pack(magic, record.size))
+            for values in records:
+                file.write(record.pack(*values))
+        os.replace(temporary, path)
+
+        return len(records)
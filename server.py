@@ -0,0 +1,355 @@
+import argparse
+import logging
+import socketserver
+import sys
+import threading
+import time
+
+from math import inf
+from typing import Callable, List, Tuple, Union
+
+from checkers import Checkers
+from bitboard import Bitboard, LOCATIONS, location_to_square
+from transposition import TranspositionTable
+from worker import EngineWorker
+
+
+
+
+# headless engine, driven by a line protocol over stdin/stdout or a local tcp socket, no pygame involved
+#
+# commands:
+#   isready                                     -> readyok
+#   newgame                                     back to the initial position, clears nothing else
+#   position startpos [moves <move> ...]
+#   position fen <fen> [moves <move> ...]       fen as in pdn, e.g. B:W21,22,K30:B1,2,3
+#   go [depth <n>] [movetime <ms>] [nodes <n>] [infinite]
+#                                               -> info depth <n> score <value> nodes <n> time <ms> pv <move> ...
+#                                               -> bestmove <move> | bestmove none
+#   stop                                        ends the running search, its bestmove is still sent
+#   d                                           prints the board and the fen
+#   quit                                        stops the running search and ends the session
+#
+# at the end of the input a running search still completes and sends its bestmove, unless it has no limit
+# (go infinite, or go without depth, movetime or nodes), that one is stopped first
+#
+# squares are numbered 1 to 32 as in pdn, row by row from black's side of the board, black starts on 1 to 12
+# and moves first, moves are written 9-13, captures list every landing square, 19x10x1
+
+
+
+Option = Tuple[Checkers.Location, Union[Checkers.Move, List[Checkers.Jump]]]
+
+# deepest search for go infinite, or for go without a depth
+max_depth = 64
+
+
+
+
+# --------
+# NOTATION
+# --------
+
+# bitboard squares run from white's side, pdn numbers from black's
+def to_pdn(square: int) -> int:
+    return 32 - square
+
+
+def from_pdn(number: int) -> int:
+    if not 1 <= number <= 32:
+        raise Exception(f"Invalid square {number}.")
+
+    return 32 - number
+
+
+def format_move(option: Option) -> str:
+    location, action = option
+    separator = "x" if Checkers.is_capture(action) else "-"
+    return separator.join(str(to_pdn(square)) for square in Bitboard.from_action(location, action))
+
+
+# the move is looked up among the legal ones, so anything that is not legal is rejected
+def parse_move(board: Checkers, player: int, text: str) -> Option:
+    for option in board.iter_actions(player):
+        if format_move(option) == text:
+            return option
+
+    raise Exception(f"Invalid move {text}.")
+
+
+def parse_fen(fen: str) -> Tuple[List[List[int]], int]:
+    fields = fen.strip().rstrip(".").split(":")
+    if len(fields) != 3 or fields[0] not in ("B", "W"):
+        raise Exception("Invalid fen.")
+
+    board = [[Checkers.empty] * Checkers.size for _ in range(Checkers.size)]
+    for field in fields[1:]:
+        color = Checkers.black if field[0] == "B" else Checkers.white
+        for square in filter(None, field[1:].split(",")):
+            king = square[0] == "K"
+            location = LOCATIONS[from_pdn(int(square[1:] if king else square))]
+            board[location.row][location.col] = color * 3 if king else color
+
+    return board, Checkers.black if fields[0] == "B" else Checkers.white
+
+
+def format_fen(board: Checkers) -> str:
+    squares = {Checkers.white: [], Checkers.black: []}
+    # in pdn order, from black's side
+    for location in reversed(Checkers.playable):
+        value = board.board[location.row][location.col]
+        if value != Checkers.empty:
+            square = str(to_pdn(location_to_square(location)))
+            squares[1 if value > 0 else -1].append("K" + square if abs(value) == 3 else square)
+
+    side = "B" if board.player == Checkers.black else "W"
+    return f"{side}:W{','.join(squares[Checkers.white])}:B{','.join(squares[Checkers.black])}"
+
+
+def format_score(value: float) -> str:
+    if value == inf:
+        return "win"
+    if value == -inf:
+        return "loss"
+
+    return str(int(value))
+
+
+
+
+# -------
+# SESSION
+# -------
+
+# one game and one engine process, write is called with every line to send
+class Session:
+
+    def __init__(self, write: Callable[[str], None], transposition_size: int = 1 << 16,
+                 transposition_replacement: str = TranspositionTable.depth_preferred, workers: int = 1,
+                 batch_evaluation: bool = False, book: str = None, tablebase: str = None) -> None:
+        self.write = write
+        self.worker = EngineWorker(transposition_size = transposition_size,
+                                   transposition_replacement = transposition_replacement, workers = workers,
+                                   batch_evaluation = batch_evaluation, book = book, tablebase = tablebase)
+        self.board = Checkers()
+        self.pump = None
+        # the running search has no limit of its own, it only ends with stop
+        self.unbounded = False
+
+
+    # returns False once the session should end
+    def handle(self, line: str) -> bool:
+        tokens = line.split()
+        if not tokens:
+            return True
+
+        command, arguments = tokens[0], tokens[1:]
+        try:
+            if command == "quit":
+                return False
+            elif command == "isready":
+                self.write("readyok")
+            elif command == "newgame":
+                self.stop()
+                self.board = Checkers()
+            elif command == "position":
+                self.stop()
+                self.set_position(arguments)
+            elif command == "go":
+                self.go(arguments)
+            elif command == "stop":
+                self.stop()
+            elif command == "d":
+                for row in str(self.board).splitlines():
+                    self.write("info string " + row)
+                self.write("info string " + format_fen(self.board))
+            else:
+                raise Exception(f"Unknown command {command}.")
+        except Exception as error:
+            self.write(f"error {error}")
+
+        return True
+
+
+    def set_position(self, arguments: List[str]) -> None:
+        if "moves" in arguments:
+            index = arguments.index("moves")
+            arguments, moves = arguments[:index], arguments[index + 1:]
+        else:
+            moves = []
+
+        if arguments == ["startpos"]:
+            board = Checkers()
+        elif len(arguments) == 2 and arguments[0] == "fen":
+            board = Checkers(*parse_fen(arguments[1]))
+        else:
+            raise Exception("Invalid position.")
+
+        for text in moves:
+            board.apply(*parse_move(board, board.player, text))
+
+        self.board = board
+
+
+    def go(self, arguments: List[str]) -> None:
+        depth, time_limit, node_limit = max_depth, None, None
+        tokens = iter(arguments)
+        for name in tokens:
+            if name == "infinite":
+                # the default, only stop or a limit given with it ends the search
+                continue
+            if name not in ("depth", "movetime", "nodes"):
+                raise Exception(f"Unknown go argument {name}.")
+
+            value = next(tokens, None)
+            if value is None or not value.isdigit():
+                raise Exception(f"Invalid value for {name}.")
+
+            if name == "depth":
+                depth = int(value)
+            elif name == "movetime":
+                time_limit = int(value) / 1000
+            else:
+                node_limit = int(value)
+
+        self.stop()
+        self.unbounded = depth >= max_depth and time_limit is None and node_limit is None
+
+        if self.board.won():
+            self.write("bestmove none")
+            return
+
+        self.worker.start(self.board, self.board.player, depth, time_limit, node_limit)
+        self.pump = threading.Thread(target = self.pump_events, daemon = True)
+        self.pump.start()
+
+
+    # forwards the events of the running search, until its end
+    def pump_events(self) -> None:
+        while self.worker.thinking:
+            for event in self.worker.poll():
+                if type(event) == EngineWorker.Progress:
+                    result = event.result
+                    self.write(f"info depth {result.depth} score {format_score(result.value)} nodes {result.nodes} "
+                               f"time {int(result.time * 1000)} pv {' '.join(format_move(option) for option in result.pv)}")
+                elif type(event) == EngineWorker.Error:
+                    self.write(f"error {event.message}")
+                    self.write("bestmove none")
+                elif event.result is None or event.result.move is None:
+                    self.write("bestmove none")
+                else:
+                    self.write(f"bestmove {format_move(event.result.move)}")
+
+            time.sleep(0.005)
+
+
+    # waits for the bestmove of the running search, if any
+    def stop(self) -> None:
+        if self.pump is not None:
+            self.worker.stop()
+            self.pump.join()
+            self.pump = None
+
+
+    # at the end of the input, lets the running search send its bestmove
+    def finish(self) -> None:
+        if self.pump is None:
+            return
+
+        if self.unbounded:
+            self.stop()
+        else:
+            self.pump.join()
+            self.pump = None
+
+
+    def close(self) -> None:
+        self.stop()
+        self.worker.close()
+
+
+
+
+# -------
+# SERVERS
+# -------
+
+def serve_stdio(**options) -> None:
+    lock = threading.Lock()
+
+    def write(line: str) -> None:
+        with lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    session = Session(write, **options)
+    try:
+        for line in sys.stdin:
+            if not session.handle(line):
+                break
+        else:
+            session.finish()
+    finally:
+        session.close()
+
+
+def serve_tcp(host: str, port: int, **options) -> None:
+
+    # every connection plays its own game with its own engine process
+    class Handler(socketserver.StreamRequestHandler):
+
+        def handle(self) -> None:
+            lock = threading.Lock()
+
+            def write(line: str) -> None:
+                with lock:
+                    try:
+                        self.wfile.write((line + "\n").encode())
+                        self.wfile.flush()
+                    except OSError:
+                        # the client went away
+                        pass
+
+            session = Session(write, **options)
+            try:
+                for line in self.rfile:
+                    if not session.handle(line.decode(errors = "replace")):
+                        break
+                else:
+                    session.finish()
+            finally:
+                session.close()
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer((host, port), Handler) as server:
+        server.daemon_threads = True
+        server.serve_forever()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description = "Headless checkers engine speaking a line protocol.")
+    parser.add_argument("--port", type = int, help = "listen on this tcp port instead of stdin/stdout")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--workers", type = int, default = 1, help = "processes per search")
+    parser.add_argument("--transposition-size", type = int, default = 1 << 16)
+    parser.add_argument("--batch-evaluation", action = "store_true", help = "score quiet leaves with numpy")
+    parser.add_argument("--book", help = "opening book built by book.py")
+    parser.add_argument("--tablebase", help = "endgame tablebase built by tablebase.py")
+    parser.add_argument("--log-level", default = "WARNING", help = "engine log on stderr, stdout is the protocol")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level = args.log_level.upper(), stream = sys.stderr, format = "%(name)s %(message)s")
+
+    options = {"transposition_size": args.transposition_size, "workers": args.workers,
+               "batch_evaluation": args.batch_evaluation, "book": args.book, "tablebase": args.tablebase}
+    if args.port is None:
+        serve_stdio(**options)
+    else:
+        serve_tcp(args.host, args.port, **options)
+
+    return 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from typing import List, Tuple
+
+
+
+
+# measures how long a fresh interpreter takes to import each entry point, the cost every short lived
+# engine process pays before doing any work, and checks that pygame stays out of the headless ones
+
+MODULES = ["checkers", "engine", "worker", "server", "game", "gamecli"]
+
+# run in the child, prints the import time in seconds and whether pygame got loaded
+PROBE = "import sys, time; start = time.perf_counter(); import {module}; " \
+        "print(time.perf_counter() - start, 'pygame' in sys.modules)"
+
+
+
+
+def measure(module: str, runs: int) -> List[Tuple[float, float, bool]]:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module = module)],
+                                capture_output = True, text = True, check = True).stdout.split()[-2:]
+        total = time.perf_counter() - start
+        times.append((total, float(output[0]), output[1] == "True"))
+
+    return times
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description = "Import time of the engine entry points.")
+    parser.add_argument("--runs", type = int, default = 10)
+    parser.add_argument("modules", nargs = "*", default = MODULES)
+    args = parser.parse_args(argv)
+
+    baseline = statistics.median(total for total, _, _ in measure("sys", args.runs))
+    print(f"{'interpreter':12} {baseline * 1000:8.1f} ms")
+
+    failed = False
+    for module in args.modules:
+        times = measure(module, args.runs)
+        total = statistics.median(total for total, _, _ in times)
+        imports = statistics.median(imports for _, imports, _ in times)
+        pygame = times[0][2]
+
+        print(f"{module:12} {total * 1000:8.1f} ms process {imports * 1000:8.1f} ms import"
+              f"{'  pygame loaded' if pygame else ''}")
+
+        # none of these may need a display
+        failed = failed or pygame
+
+    return 1 if failed else 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
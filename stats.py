@@ -0,0 +1,219 @@
+import copy
+import json
+import time
+
+from typing import Callable, Dict, IO, Iterator, List, Union
+
+
+
+
+# what a search spent its time on, collected only when asked for: the engine methods that are timed are
+# wrapped on the instance for the length of one search, so a search without statistics runs the plain methods
+
+
+
+
+class SearchStats:
+
+    # what add() sums, nodes are counted by the engine itself
+    summed = ("leaves", "cutoffs", "first_move_cutoffs", "transposition_probes", "transposition_hits", "tablebase_hits",
+              "move_generation_time", "evaluation_time", "copy_time")
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.time = 0.0
+
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        # positions scored by the heuristic, one by one or in batches
+        self.leaves = 0
+        # nodes of every completed iteration, used for the branching factor
+        self.iteration_nodes: List[int] = []
+
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.transposition_probes = 0
+        self.transposition_hits = 0
+        self.tablebase_hits = 0
+
+        # seconds
+        self.move_generation_time = 0.0
+        self.evaluation_time = 0.0
+        self.copy_time = 0.0
+
+
+    # growth of the tree from one iteration to the next, or the depth-th root of the nodes of a single iteration
+    def branching_factor(self) -> float:
+        if len(self.iteration_nodes) >= 2 and self.iteration_nodes[-2]:
+            return self.iteration_nodes[-1] / self.iteration_nodes[-2]
+
+        if self.depth and self.nodes:
+            return self.nodes ** (1 / self.depth)
+
+        return 0.0
+
+
+    def first_move_cutoff_rate(self) -> float:
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+
+    def transposition_hit_rate(self) -> float:
+        return self.transposition_hits / self.transposition_probes if self.transposition_probes else 0.0
+
+
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.time if self.time else 0.0
+
+
+    # adds the counters of a search run in a pool process, its times are added too, so with workers > 1
+    # they are summed over the processes and may exceed the time of the search
+    def add(self, other: "SearchStats") -> None:
+        for name in SearchStats.summed:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+    def as_dict(self) -> Dict[str, Union[int, float, List[int]]]:
+        values = dict(vars(self))
+        values["branching_factor"] = self.branching_factor()
+        values["first_move_cutoff_rate"] = self.first_move_cutoff_rate()
+        values["transposition_hit_rate"] = self.transposition_hit_rate()
+        values["nodes_per_second"] = self.nodes_per_second()
+
+        return values
+
+
+    # one json object per line
+    def write(self, file: IO[str]) -> None:
+        file.write(json.dumps(self.as_dict()) + "\n")
+        file.flush()
+
+
+    def __repr__(self) -> str:
+        return f"SearchStats(depth={self.depth}, nodes={self.nodes}, leaves={self.leaves}, " \
+               f"branching_factor={self.branching_factor():.2f}, cutoffs={self.cutoffs}, " \
+               f"transposition_hits={self.transposition_hits}, time={self.time:.3f})"
+
+
+
+
+# ---------------
+# INSTRUMENTATION
+# ---------------
+
+class Instrumentation:
+
+    # the engine methods that get timed, by the counter they add to
+    move_generation = ("get_ordered_moves", "get_player_moves", "get_actions", "get_captures", "can_capture")
+    evaluation = ("heuristic", "evaluate_batch")
+    copying = ("make_move", "unmake_move")
+
+
+
+    def __init__(self, engine: "Engine") -> None:
+        self.engine = engine
+        self.stats = SearchStats()
+        self.start = time.perf_counter()
+
+        # counters the engine keeps anyway, only their change during this search is reported
+        self.cutoffs = engine.ordering.cutoffs
+        self.first_move_cutoffs = engine.ordering.first_move_cutoffs
+        self.transposition_probes = engine.transposition.probes
+        self.transposition_hits = engine.transposition.hits
+        self.tablebase_hits = engine.tablebase_hits
+
+        # what the pool processes report for the root moves they searched
+        self.workers = SearchStats()
+
+        stats = self.stats
+        for name in Instrumentation.move_generation:
+            setattr(engine, name, self.timed(getattr(engine, name), "move_generation_time"))
+
+        heuristic = self.timed(engine.heuristic, "evaluation_time")
+        evaluate_batch = self.timed(engine.evaluate_batch, "evaluation_time")
+
+        def counted_heuristic(*args, **kwargs):
+            stats.leaves += 1
+            return heuristic(*args, **kwargs)
+
+        def counted_evaluate_batch(boards, *args, **kwargs):
+            stats.leaves += len(boards)
+            return evaluate_batch(boards, *args, **kwargs)
+
+        engine.heuristic = counted_heuristic
+        engine.evaluate_batch = counted_evaluate_batch
+
+
+    def timed(self, function: Callable, counter: str) -> Callable:
+        stats = self.stats
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            result = function(*args, **kwargs)
+            setattr(stats, counter, getattr(stats, counter) + clock() - start)
+
+            if isinstance(result, Iterator):
+                return self.timed_iterator(result, counter)
+            return result
+
+        return wrapper
+
+
+    # lazy move generation does its work while it is iterated
+    def timed_iterator(self, iterator: Iterator, counter: str) -> Iterator:
+        stats = self.stats
+        clock = time.perf_counter
+
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                setattr(stats, counter, getattr(stats, counter) + clock() - start)
+                return
+            setattr(stats, counter, getattr(stats, counter) + clock() - start)
+
+            yield item
+
+
+    # the board the search works on, copied from the engine's
+    def copy_board(self, board: "Checkers") -> "Checkers":
+        start = time.perf_counter()
+        board = copy.deepcopy(board)
+        self.stats.copy_time += time.perf_counter() - start
+
+        # boards sent to the pool processes must stay picklable, their copying is not timed then
+        if self.engine.workers <= 1:
+            for name in Instrumentation.copying:
+                setattr(board, name, self.timed(getattr(board, name), "copy_time"))
+
+        return board
+
+
+    def add_worker(self, stats: SearchStats) -> None:
+        self.workers.add(stats)
+
+
+    def iteration(self, nodes: int) -> None:
+        self.stats.iteration_nodes.append(nodes - sum(self.stats.iteration_nodes))
+
+
+    # takes the wrappers off the engine and fills in the totals
+    def finish(self) -> SearchStats:
+        engine = self.engine
+        for name in Instrumentation.move_generation + Instrumentation.evaluation:
+            engine.__dict__.pop(name, None)
+
+        stats = self.stats
+        stats.time = time.perf_counter() - self.start
+        stats.depth = engine.search_depth
+        stats.nodes = engine.nodes
+        stats.quiescence_nodes = engine.quiescence_nodes
+        stats.cutoffs = engine.ordering.cutoffs - self.cutoffs
+        stats.first_move_cutoffs = engine.ordering.first_move_cutoffs - self.first_move_cutoffs
+        stats.transposition_probes = engine.transposition.probes - self.transposition_probes
+        stats.transposition_hits = engine.transposition.hits - self.transposition_hits
+        stats.tablebase_hits = engine.tablebase_hits - self.tablebase_hits
+        stats.add(self.workers)
+
+        return stats
@@ -0,0 +1,386 @@
+import argparse
+import itertools
+import logging
+import mmap
+import os
+import sys
+import time
+
+from array import array
+from collections import deque
+from math import comb
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from checkers import Checkers
+from bitboard import Bitboard, LOCATIONS, BLACK_BACK_ROW, WHITE_BACK_ROW
+
+
+
+
+logger = logging.getLogger(__name__)
+
+
+
+
+# endgame tablebase: every position with at most a few pieces solved by retrograde analysis, stored as
+# won or lost for the side to move with the distance in plies to the end of the game, one byte per position:
+# positions are numbered by the squares of each kind of piece, so the file is a flat table indexed without a key
+
+
+
+
+# ---------
+# INDEXING
+# ---------
+
+BINOMIAL = [[comb(n, k) for k in range(33)] for n in range(33)]
+
+# men never stand on the row they promote on, black men use squares 4 to 31, white men 0 to 27
+MAN_SQUARES = 28
+
+
+# the number of the set of squares among all sets of as many squares, squares below base are not used
+def rank(mask: int, base: int = 0) -> int:
+    index = 0
+    k = 1
+    while mask:
+        low = mask & -mask
+        index += BINOMIAL[low.bit_length() - 1 - base][k]
+        k += 1
+        mask ^= low
+
+    return index
+
+
+# the positions of every material signature (black men, black kings, white men, white kings) take one
+# contiguous range, in which they are numbered by the squares of each kind and the side to move;
+# subsets that overlap get an index too, they are never probed and stay draws
+class PositionIndex:
+
+    # value on the board to the kind of piece, in the order of the signature
+    kinds = {Checkers.black: 0, Checkers.black_king: 1, Checkers.white: 2, Checkers.white_king: 3}
+
+    def __init__(self, pieces: int) -> None:
+        self.pieces = pieces
+        self.signatures = [signature for signature in itertools.product(range(pieces + 1), repeat = 4)
+                           if 2 <= sum(signature) <= pieces and signature[0] + signature[1] and signature[2] + signature[3]]
+
+        self.offsets = {}
+        self.size = 0
+        for signature in self.signatures:
+            self.offsets[signature] = self.size
+            self.size += 2 * PositionIndex.combinations(signature)
+
+
+    @staticmethod
+    def combinations(signature: Tuple[int, int, int, int]) -> int:
+        black_men, black_kings, white_men, white_kings = signature
+        return BINOMIAL[MAN_SQUARES][black_men] * BINOMIAL[32][black_kings] * \
+               BINOMIAL[MAN_SQUARES][white_men] * BINOMIAL[32][white_kings]
+
+
+    def of_masks(self, black_men: int, black_kings: int, white_men: int, white_kings: int, player: Checkers.Player) -> int:
+        counts = (bin(black_men).count("1"), bin(black_kings).count("1"), bin(white_men).count("1"),
+                  bin(white_kings).count("1"))
+
+        index = rank(black_men, 32 - MAN_SQUARES)
+        index = index * BINOMIAL[32][counts[1]] + rank(black_kings)
+        index = index * BINOMIAL[MAN_SQUARES][counts[2]] + rank(white_men)
+        index = index * BINOMIAL[32][counts[3]] + rank(white_kings)
+
+        return self.offsets[counts] + 2 * index + (player == Checkers.white)
+
+
+    def of_bitboard(self, bitboard: Bitboard, player: Checkers.Player) -> int:
+        black, white, kings = bitboard
+        return self.of_masks(black & ~kings, black & kings, white & ~kings, white & kings, player)
+
+
+    # None for a man on the row it promotes on, which no game reaches
+    def of_board(self, board: Checkers, player: Checkers.Player) -> Optional[int]:
+        masks = [0, 0, 0, 0]
+        left = board.white_count + board.black_count
+        rows = board.board
+
+        for square, location in enumerate(LOCATIONS):
+            value = rows[location.row][location.col]
+            if value:
+                masks[PositionIndex.kinds[value]] |= 1 << square
+                left -= 1
+                if not left:
+                    break
+
+        if (masks[0] & BLACK_BACK_ROW) or (masks[2] & WHITE_BACK_ROW):
+            return None
+
+        return self.of_masks(*masks, player)
+
+
+
+
+class Tablebase:
+
+    # ------------------
+    # NAMESPACED CLASSES
+    # ------------------
+
+    class Entry(NamedTuple):
+        # 1 the side to move wins, -1 it loses, 0 draw
+        result: int
+        # plies until the side to move has no pieces or no moves left, 0 for draws
+        distance: int
+
+
+
+    # the last byte is the number of pieces, the table follows
+    magic = b"CKTBIDX"
+    header_size = len(magic) + 1
+
+    win = 1
+    loss = -1
+    draw = 0
+
+    # returned by value() for a win in 0 plies, every ply of distance costs one point, so that the search
+    # prefers the quickest win and the slowest loss, it stays well above any heuristic value
+    win_value = 1000000
+
+    # wins are an odd number of plies away and losses an even one, so the byte is the distance plus one,
+    # 0 for draws
+    max_distance = 254
+
+
+
+    # ----------------
+    # PUBLIC FUNCTIONS
+    # ----------------
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        magic = self.file.read(Tablebase.header_size)
+        if len(magic) != Tablebase.header_size or magic[:-1] != Tablebase.magic:
+            self.file.close()
+            raise Exception("Invalid tablebase.")
+
+        self.pieces = magic[-1]
+        self.index = PositionIndex(self.pieces)
+        if size != Tablebase.header_size + self.index.size:
+            self.file.close()
+            raise Exception("Invalid tablebase.")
+
+        # processes opening the same file share its pages
+        self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+
+
+    def __len__(self) -> int:
+        return self.index.size
+
+
+    def __reduce__(self) -> Tuple:
+        return Tablebase, (self.path,)
+
+
+    def close(self) -> None:
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+
+    def covers(self, board: Checkers) -> bool:
+        return board.white_count + board.black_count <= self.pieces
+
+
+    # None for positions with more pieces than the tablebase holds, player is the side to move
+    def probe(self, board: Checkers, player: Checkers.Player) -> Optional[Entry]:
+        if not self.covers(board):
+            return None
+
+        index = self.index.of_board(board, player)
+        if index is None:
+            return Tablebase.Entry(Tablebase.draw, 0)
+
+        return Tablebase.decode(self.data[Tablebase.header_size + index])
+
+
+    # from the point of view of player, the side to move, as the search scores it
+    def value(self, board: Checkers, player: Checkers.Player) -> Optional[int]:
+        entry = self.probe(board, player)
+        if entry is None:
+            return None
+
+        return entry.result * (Tablebase.win_value - entry.distance)
+
+
+    @staticmethod
+    def encode(distance: int) -> int:
+        if distance > Tablebase.max_distance:
+            # keeps the parity, and so the result
+            distance = Tablebase.max_distance - distance % 2
+
+        return distance + 1
+
+
+    @staticmethod
+    def decode(byte: int) -> Entry:
+        if not byte:
+            return Tablebase.Entry(Tablebase.draw, 0)
+
+        distance = byte - 1
+        return Tablebase.Entry(Tablebase.win if distance % 2 else Tablebase.loss, distance)
+
+
+
+
+# ----------
+# GENERATION
+# ----------
+
+# every position with 2 to pieces pieces, both sides present, and no man on the row it promotes on,
+# with its index, in no particular order
+def iter_positions(index: PositionIndex) -> Iterator[Tuple[int, Bitboard, int]]:
+    man_squares = {Checkers.black: range(32 - MAN_SQUARES, 32), Checkers.white: range(MAN_SQUARES)}
+
+    for black_men, black_kings, white_men, white_kings in index.signatures:
+        count = black_men + black_kings + white_men + white_kings
+        for squares in itertools.product(itertools.combinations(man_squares[Checkers.black], black_men),
+                                         itertools.combinations(range(32), black_kings),
+                                         itertools.combinations(man_squares[Checkers.white], white_men),
+                                         itertools.combinations(range(32), white_kings)):
+            masks = [sum(1 << square for square in kind) for kind in squares]
+            if bin(masks[0] | masks[1] | masks[2] | masks[3]).count("1") != count:
+                # two pieces on one square
+                continue
+
+            bitboard = Bitboard(masks[0] | masks[1], masks[2] | masks[3], masks[1] | masks[3])
+            black = index.of_masks(*masks, Checkers.black)
+            yield black, bitboard, Checkers.black
+            yield black + 1, bitboard, Checkers.white
+
+
+# the children of a position that is not decided by its own moves, None if it is: its byte in table is set
+def get_children(index: PositionIndex, bitboard: Bitboard, player: int, i: int, table: bytearray) -> Optional[List[int]]:
+    actions = bitboard.get_actions(player)
+    if not actions:
+        # no moves left
+        table[i] = Tablebase.encode(0)
+        return None
+
+    children = []
+    for path in actions:
+        child = bitboard.apply(path)
+        if not child.pieces(-player):
+            # captured the last piece
+            table[i] = Tablebase.encode(1)
+            return None
+
+        children.append(index.of_bitboard(child, -player))
+
+    return children
+
+
+# retrograde analysis: the positions where the side to move has lost are known first, their parents are won,
+# a parent is lost once all of its children are won, and so on breadth first, so the distances are the
+# quickest wins and the slowest losses, whatever is never reached is a draw
+#
+# the game graph is kept in flat arrays, about 6 bytes per index and 8 per move: the children of every
+# position in the order the positions are enumerated, then the same edges reversed
+def generate(pieces: int) -> bytearray:
+    start = time.perf_counter()
+    index = PositionIndex(pieces)
+    size = index.size
+
+    table = bytearray(size)
+    # how many children of each position are not yet known to be won
+    remaining = bytearray(size)
+    # parents[first[i]:first[i + 1]] are the positions with a move to i
+    first = array("I", bytes(4 * (size + 1)))
+
+    edges = array("I")
+
+    for i, bitboard, player in iter_positions(index):
+        children = get_children(index, bitboard, player, i, table)
+        if children is not None:
+            remaining[i] = len(children)
+            edges.extend(children)
+            for child in children:
+                first[child + 1] += 1
+
+    for i in range(size):
+        first[i + 1] += first[i]
+    logger.info("%d indices, %d moves counted in %.1fs", size, first[size], time.perf_counter() - start)
+
+    parents = array("I", bytes(4 * first[size]))
+    filled = array("I", first)
+    edge = 0
+    for i, _, _ in iter_positions(index):
+        for child in edges[edge:edge + remaining[i]]:
+            parents[filled[child]] = i
+            filled[child] += 1
+        edge += remaining[i]
+    del filled, edges
+    logger.info("game graph built in %.1fs", time.perf_counter() - start)
+
+    # immediate losses and wins are distance 0 and 1, the queue stays ordered by distance
+    queue = deque(i for i in range(size) if table[i] == Tablebase.encode(0))
+    queue.extend(i for i in range(size) if table[i] == Tablebase.encode(1))
+    while queue:
+        i = queue.popleft()
+        entry = Tablebase.decode(table[i])
+        byte = Tablebase.encode(entry.distance + 1)
+
+        for parent in parents[first[i]:first[i + 1]]:
+            if table[parent]:
+                continue
+
+            if entry.result == Tablebase.loss:
+                # moving into a lost position wins
+                table[parent] = byte
+                queue.append(parent)
+            else:
+                remaining[parent] -= 1
+                if remaining[parent] == 0:
+                    # every move leads to a won position for the opponent, this is the longest of them
+                    table[parent] = byte
+                    queue.append(parent)
+    logger.info("solved in %.1fs", time.perf_counter() - start)
+
+    return table
+
+
+# the file is replaced only once it is complete
+def write(path: str, pieces: int, table: bytearray) -> int:
+    if len(table) != PositionIndex(pieces).size:
+        raise Exception("Invalid tablebase.")
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(Tablebase.magic + bytes([pieces]))
+        file.write(table)
+    os.replace(temporary, path)
+
+    return len(table) - table.count(0)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description = "Builds the endgame tablebase.")
+    parser.add_argument("output")
+    parser.add_argument("--pieces", type = int, default = 3,
+                        help = "positions with at most this many pieces, 4 is the practical limit: "
+                                                            "15 MB, about 7 minutes and 600 MB of memory to build")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level = logging.INFO, format = "%(message)s")
+
+    table = generate(args.pieces)
+    count = write(args.output, args.pieces, table)
+    logger.info("%d won or lost positions written to %s", count, args.output)
+
+    return 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
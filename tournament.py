@@ -0,0 +1,299 @@
+import argparse
+import importlib
+import json
+import math
+import random
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from checkers import Checkers
+from engine import Engine
+
+
+
+
+# plays two engine configurations against each other, every opening with both colors, spread over worker
+# processes, and estimates the elo difference between them, so that a faster engine can be checked not to
+# play weaker
+
+
+
+
+class Player(NamedTuple):
+    name: str
+    depth: int = 5
+    time_limit: Optional[float] = None
+    node_limit: Optional[int] = None
+    algorithm: str = "alpha_beta"
+    quiescence_limit: int = 20000
+    batch_evaluation: bool = False
+    # dotted path of the engine class, to test a subclass with another heuristic
+    engine: str = "engine.Engine"
+    book: Optional[str] = None
+    tablebase: Optional[str] = None
+
+
+class Game_result(NamedTuple):
+    opening: int
+    black: str
+    white: str
+    # 1 black won, -1 white won, 0 draw
+    result: int
+    reason: str
+    plies: int
+    # seconds spent on every move, by player name
+    move_times: Dict[str, List[float]]
+    nodes: Dict[str, int]
+
+
+class Elo(NamedTuple):
+    games: int
+    wins: int
+    draws: int
+    losses: int
+    score: float
+    difference: float
+    # 95% confidence interval of the difference
+    lower: float
+    upper: float
+
+
+
+
+# --------
+# OPENINGS
+# --------
+
+# distinct random positions a few plies from the start, the same seed gives the same openings
+def get_openings(count: int, plies: int, seed: int) -> List[List[Tuple]]:
+    rng = random.Random(seed)
+    openings = []
+    seen = set()
+
+    attempts = 0
+    while len(openings) < count and attempts < count * 100:
+        attempts += 1
+        board = Checkers()
+        player = Checkers.black
+        moves = []
+
+        for _ in range(plies):
+            options = list(board.iter_actions(player))
+            if not options:
+                break
+            option = rng.choice(options)
+            board.apply(*option)
+            moves.append(option)
+            player = -player
+
+        if board.hash not in seen and not board.won():
+            seen.add(board.hash)
+            openings.append(moves)
+
+    return openings
+
+
+
+
+# -----
+# GAMES
+# -----
+
+def create_engine(player: Player) -> Engine:
+    module, name = player.engine.rsplit(".", 1)
+    engine = getattr(importlib.import_module(module), name)(quiescence_limit = player.quiescence_limit,
+                                                                    batch_evaluation = player.batch_evaluation,
+                                                                    book = player.book, tablebase = player.tablebase)
+    engine.difficulty = player.depth
+    engine.time_limit = player.time_limit
+    engine.node_limit = player.node_limit
+
+    return engine
+
+
+# runs in a worker process, a game is drawn after max_plies or when a position is repeated three times
+def play_game(index: int, opening: List[Tuple], black: Player, white: Player, max_plies: int) -> Game_result:
+    board = Checkers()
+    for option in opening:
+        board.apply(*option)
+
+    engines = {Checkers.black: create_engine(black), Checkers.white: create_engine(white)}
+    players = {Checkers.black: black, Checkers.white: white}
+    move_times = {black.name: [], white.name: []}
+    nodes = {black.name: 0, white.name: 0}
+    repetitions = {board.hash: 1}
+
+    result, reason = 0, "move limit"
+    plies = len(opening)
+    while plies < max_plies:
+        player = board.player
+
+        winner = board.won()
+        if winner:
+            result, reason = winner, "no pieces left"
+            break
+        if not board.can_jump(player) and not any(True for _ in board.iter_moves_for_player(player)):
+            result, reason = -player, "no moves left"
+            break
+
+        engine = engines[player]
+        engine.board = board
+        start = time.perf_counter()
+        search = engine.search(player, getattr(engine, players[player].algorithm), engine.difficulty,
+                               engine.time_limit, engine.node_limit)
+        move_times[players[player].name].append(time.perf_counter() - start)
+        nodes[players[player].name] += search.nodes
+
+        board.apply(*search.move)
+        plies += 1
+
+        repetitions[board.hash] = repetitions.get(board.hash, 0) + 1
+        if repetitions[board.hash] >= 3:
+            reason = "repetition"
+            break
+
+    for engine in engines.values():
+        engine.close()
+
+    return Game_result(index, black.name, white.name, result, reason, plies, move_times, nodes)
+
+
+
+
+# ---
+# ELO
+# ---
+
+def score_to_elo(score: float) -> float:
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+
+    return -400 * math.log10(1 / score - 1)
+
+
+# from the point of view of name, the interval comes from the standard error of the mean game score
+def estimate_elo(results: List[Game_result], name: str) -> Elo:
+    scores = []
+    for result in results:
+        if result.result == 0:
+            scores.append(0.5)
+        else:
+            winner = result.black if result.result == Checkers.black else result.white
+            scores.append(1.0 if winner == name else 0.0)
+
+    games = len(scores)
+    if games == 0:
+        return Elo(0, 0, 0, 0, 0.0, 0.0, -math.inf, math.inf)
+
+    score = sum(scores) / games
+    deviation = math.sqrt(sum((value - score) ** 2 for value in scores) / games)
+    margin = 1.96 * deviation / math.sqrt(games)
+
+    return Elo(games, scores.count(1.0), scores.count(0.5), scores.count(0.0), score, score_to_elo(score),
+               score_to_elo(score - margin), score_to_elo(score + margin))
+
+
+
+
+# ------
+# RUNNER
+# ------
+
+def parse_player(spec: str) -> Player:
+    name, *fields = spec.split(",")
+    options = {}
+    for field in fields:
+        key, value = field.split("=", 1)
+        if key == "depth":
+            options["depth"] = int(value)
+        elif key == "time":
+            options["time_limit"] = float(value)
+        elif key == "nodes":
+            options["node_limit"] = int(value)
+        elif key == "algorithm":
+            options["algorithm"] = value
+        elif key == "quiescence":
+            options["quiescence_limit"] = int(value)
+        elif key == "batch":
+            options["batch_evaluation"] = value not in ("0", "false", "no")
+        elif key == "engine":
+            options["engine"] = value
+        elif key == "book":
+            options["book"] = value
+        elif key == "tablebase":
+            options["tablebase"] = value
+        else:
+            raise Exception(f"Invalid player option {key}.")
+
+    return Player(name, **options)
+
+
+def run(first: Player, second: Player, openings: List[List[Tuple]], max_plies: int, workers: int) -> List[Game_result]:
+    if first.name == second.name:
+        raise Exception("The players need different names.")
+
+    # every opening is played twice, with the colors swapped
+    games = []
+    for index, opening in enumerate(openings):
+        games.append((index, opening, first, second, max_plies))
+        games.append((index, opening, second, first, max_plies))
+
+    if workers <= 1:
+        return [play_game(*game) for game in games]
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = [executor.submit(play_game, *game) for game in games]
+        return [future.result() for future in futures]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description = "Engine against engine matches with an elo estimate.")
+    parser.add_argument("first", type = parse_player, help = "name[,depth=5][,time=0.1][,nodes=N][,algorithm=alpha_beta]"
+                                                             "[,quiescence=N][,batch=1][,engine=module.Class][,book=path]"
+                                                             "[,tablebase=path]")
+    parser.add_argument("second", type = parse_player)
+    parser.add_argument("--openings", type = int, default = 20, help = "every opening is played with both colors")
+    parser.add_argument("--opening-plies", type = int, default = 4)
+    parser.add_argument("--max-plies", type = int, default = 200)
+    parser.add_argument("--workers", type = int, default = 4)
+    parser.add_argument("--seed", type = int, default = 1)
+    parser.add_argument("--output", help = "write every game as a json line")
+    args = parser.parse_args(argv)
+
+    openings = get_openings(args.openings, args.opening_plies, args.seed)
+    start = time.perf_counter()
+    results = run(args.first, args.second, openings, args.max_plies, args.workers)
+    seconds = time.perf_counter() - start
+
+    if args.output:
+        with open(args.output, "w") as file:
+            for result in results:
+                file.write(json.dumps(result._asdict()) + "\n")
+
+    for player in (args.first, args.second):
+        times = [value for result in results for value in result.move_times[player.name]]
+        nodes = sum(result.nodes[player.name] for result in results)
+        print(f"{player.name:12} {len(times):6} moves  {sum(times) / max(len(times), 1) * 1000:9.1f} ms/move  "
+              f"{max(times, default = 0) * 1000:9.1f} ms max  {nodes / max(sum(times), 1e-9):10.0f} nodes/s")
+
+    reasons = {}
+    for result in results:
+        reasons[result.reason] = reasons.get(result.reason, 0) + 1
+    print(f"{len(results)} games in {seconds:.1f}s, " + ", ".join(f"{count} {reason}" for reason, count in reasons.items()))
+
+    elo = estimate_elo(results, args.first.name)
+    print(f"{args.first.name} vs {args.second.name}: +{elo.wins} ={elo.draws} -{elo.losses}  score {elo.score:.3f}  "
+          f"elo {elo.difference:+.1f} [{elo.lower:+.1f}, {elo.upper:+.1f}] 95%")
+
+    return 0
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
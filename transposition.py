@@ -0,0 +1,118 @@
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+
+
+
+class TranspositionTable:
+
+    # ------------------
+    # NAMESPACED CLASSES
+    # ------------------
+
+    class Entry(NamedTuple):
+        key: int
+        depth: int
+        value: float
+        bound: int
+        best_move: Optional[Tuple]
+        generation: int
+
+
+    # ----------------
+    # STATIC VARIABLES
+    # ----------------
+
+    # bound types
+    exact = 0
+    lower = 1    # the value failed high, the real one is at least this
+    upper = 2    # the value failed low, the real one is at most this
+
+    # replacement schemes
+    depth_preferred = "depth"
+    always_replace = "always"
+
+
+
+    # ----------------
+    # PUBLIC FUNCTIONS
+    # ----------------
+
+    # size is the number of slots, rounded down to a power of two, the table never grows past it
+    def __init__(self, size: int = 1 << 16, replacement: str = depth_preferred) -> None:
+        if replacement not in (TranspositionTable.depth_preferred, TranspositionTable.always_replace):
+            raise Exception("Invalid replacement scheme.")
+
+        self.size = 1 << (max(size, 1).bit_length() - 1)
+        self.mask = self.size - 1
+        self.replacement = replacement
+        self.clear()
+
+
+    def clear(self) -> None:
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.occupied = 0
+        self.reset_stats()
+
+
+    def reset_stats(self) -> None:
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+
+    # called once per search, entries left over from older searches may then be replaced
+    # regardless of their depth
+    def new_search(self) -> None:
+        self.generation += 1
+
+
+    def probe(self, key: int) -> Optional[Entry]:
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+
+        return None
+
+
+    def store(self, key: int, depth: int, value: float, bound: int, best_move: Optional[Tuple]) -> None:
+        index = key & self.mask
+        entry = self.entries[index]
+
+        if entry is None:
+            self.occupied += 1
+        elif entry.key != key:
+            if self.replacement == TranspositionTable.depth_preferred \
+                    and entry.generation == self.generation and entry.depth > depth:
+                # keep the deeper result of this search
+                return
+            self.overwrites += 1
+
+        self.stores += 1
+        self.entries[index] = TranspositionTable.Entry(key, depth, value, bound, best_move, self.generation)
+
+
+    # statistics
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+
+    def occupancy(self) -> float:
+        return self.occupied / self.size
+
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {
+            "size": self.size,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate(),
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "occupancy": self.occupancy(),
+        }
@@ -0,0 +1,208 @@
+import multiprocessing
+import queue
+
+from typing import Iterator, NamedTuple, Optional, Union
+
+from checkers import Checkers
+from engine import Engine
+from transposition import TranspositionTable
+
+
+
+
+# runs the engine in a process of its own, so the ui loop never waits on the search:
+# searches are started with a command, report every completed depth as an event, and can be stopped at any time
+
+
+
+
+class EngineWorker:
+
+    # ------------------
+    # NAMESPACED CLASSES
+    # ------------------
+
+    # commands, sent to the worker process
+
+    class Search(NamedTuple):
+        search_id: int
+        board: Checkers
+        player: int
+        max_depth: int
+        time_limit: Optional[float]
+        node_limit: Optional[int]
+
+    class Quit(NamedTuple):
+        pass
+
+    # events, sent back to the ui
+
+    # one completed iteration of the search
+    class Progress(NamedTuple):
+        search_id: int
+        result: Engine.Search_result
+
+    # the search is over, result is the deepest completed iteration, its move is None if the search was
+    # stopped before depth 1 completed
+    class Done(NamedTuple):
+        search_id: int
+        result: Optional[Engine.Search_result]
+        stopped: bool
+
+    class Error(NamedTuple):
+        search_id: int
+        message: str
+
+    Event = Union[Progress, Done, Error]
+
+
+
+    # ----------------
+    # PUBLIC FUNCTIONS
+    # ----------------
+
+    def __init__(self, transposition_size: int = 1 << 16,
+                 transposition_replacement: str = TranspositionTable.depth_preferred,
+                 workers: int = 1,
+                 quiescence_limit: int = 20000,
+                 batch_evaluation: bool = False,
+                 book: str = None,
+                 tablebase: str = None
+    ) -> None:
+
+        self.commands = multiprocessing.Queue()
+        self.events = multiprocessing.Queue()
+        # id of the last search that was stopped, searches with an id up to it abort
+        self.stopped = multiprocessing.Value("q", 0, lock = False)
+
+        # not a daemon, the engine may start its own pool of processes for the root split
+        self.process = multiprocessing.Process(target = worker_main, name = "engine-worker",
+                                               args = (self.commands, self.events, self.stopped, transposition_size,
+                                                       transposition_replacement, workers, quiescence_limit, batch_evaluation,
+                                                       book, tablebase))
+        self.process.start()
+
+        self.search_id = 0
+        self.thinking = False
+        self.pondering = False
+
+
+    # returns the id of the search, events of older searches are dropped by poll
+    def start(self, board: Checkers, player: int, max_depth: int,
+              time_limit: float = None, node_limit: int = None) -> int:
+        if self.thinking:
+            self.stop()
+
+        self.search_id += 1
+        self.commands.put(EngineWorker.Search(self.search_id, board, player, max_depth, time_limit, node_limit))
+        self.thinking = True
+        self.pondering = False
+
+        return self.search_id
+
+
+    # searches the position expected after the opponent's reply while the opponent thinks, nothing is reported,
+    # the work is kept in the transposition table of the worker: if the reply was predicted, the next start
+    # finds the results of the pondering there, otherwise they are simply never probed
+    def ponder(self, board: Checkers, player: int, max_depth: int) -> int:
+        search_id = self.start(board, player, max_depth)
+        self.pondering = True
+
+        return search_id
+
+
+    # the search ends as soon as it notices, its Done event still arrives through poll
+    def stop(self) -> None:
+        if self.thinking:
+            self.stopped.value = self.search_id
+
+
+    # never blocks, returns the events that arrived since the last call
+    def poll(self) -> Iterator[Event]:
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return
+
+            if event.search_id != self.search_id:
+                # left over from a search that was replaced
+                continue
+
+            if type(event) != EngineWorker.Progress:
+                self.thinking = False
+
+            if self.pondering:
+                continue
+
+            yield event
+
+
+    # blocks until the current search is done, mostly for scripts and the cli
+    def wait(self, timeout: float = None) -> Optional[Done]:
+        while self.thinking:
+            try:
+                event = self.events.get(timeout = timeout)
+            except queue.Empty:
+                return None
+
+            if event.search_id == self.search_id and type(event) != EngineWorker.Progress:
+                self.thinking = False
+                if type(event) == EngineWorker.Error:
+                    raise Exception(event.message)
+
+                return event
+
+        return None
+
+
+    def close(self, timeout: float = 2.0) -> None:
+        if self.process is None:
+            return
+
+        self.stopped.value = self.search_id
+        self.commands.put(EngineWorker.Quit())
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+        self.process = None
+        self.thinking = False
+
+
+
+
+# ------------------
+# WORKER PROCESS
+# ------------------
+
+# the engine lives as long as the process, so its transposition table and history carry over between searches
+def worker_main(commands: "multiprocessing.Queue", events: "multiprocessing.Queue", stopped: "multiprocessing.Value",
+                transposition_size: int, transposition_replacement: str, workers: int, quiescence_limit: int,
+                batch_evaluation: bool, book: str, tablebase: str) -> None:
+    engine = Engine(transposition_size = transposition_size, transposition_replacement = transposition_replacement,
+                    workers = workers, quiescence_limit = quiescence_limit, batch_evaluation = batch_evaluation,
+                    book = book, tablebase = tablebase)
+
+    try:
+        while True:
+            command = commands.get()
+            if type(command) == EngineWorker.Quit:
+                break
+
+            search_id = command.search_id
+            engine.board = command.board
+            engine.stop_check = lambda: stopped.value >= search_id
+            engine.progress = lambda result: events.put(EngineWorker.Progress(search_id, result))
+
+            try:
+                result = engine.search(command.player, engine.alpha_beta, command.max_depth,
+                                       command.time_limit, command.node_limit)
+            except Exception as error:
+                events.put(EngineWorker.Error(search_id, repr(error)))
+                continue
+
+            events.put(EngineWorker.Done(search_id, result, stopped.value >= search_id))
+    finally:
+        engine.close()